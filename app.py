@@ -1,92 +1,117 @@
+import asyncio
+import io
 import gradio as gr
 from datetime import datetime
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 from services import ingestion_service, retrieval_service, database_service
 from models import Article
-from utils.config import config
-
-# Validate configuration on startup
-try:
-    config.validate()
-    config.ensure_directories()
-    print("✓ Configuration validated")
-except Exception as e:
-    print(f"✗ Configuration error: {e}")
-    print("Please check your .env file and ensure all required variables are set.")
 
 # ============================================================================
 # UI Helper Functions
 # ============================================================================
 
-def format_article_for_display(article: Article) -> str:
-    """Format an article for display in the UI."""
-    author_str = f"by {article.author}" if article.author else ""
-    date_str = article.publish_date.strftime("%Y-%m-%d") if article.publish_date else "Date unknown"
-    tags_str = ", ".join(article.tags) if article.tags else "No tags"
-    
-    return f"""
-### {article.title}
-**URL:** {article.url}  
-**Author:** {author_str} | **Published:** {date_str}  
-**Added:** {article.date_added.strftime("%Y-%m-%d %H:%M")}  
-**Words:** {article.word_count} | **Tags:** {tags_str}
+_DATE_FMT = "%Y-%m-%d"
+_DATETIME_FMT = "%Y-%m-%d %H:%M"
+
+# The library is streamed to the UI this many articles at a time
+_LIBRARY_STREAM_BATCH = 10
+
+_ARTICLE_TPL = """
+### {title}
+**URL:** {url}  
+**Author:** {author} | **Published:** {published}  
+**Added:** {added}  
+**Words:** {word_count} | **Tags:** {tags}
 
 **Summary:**  
-{article.summary or "No summary available"}
+{summary}
+
+---
+"""
+
+_SEARCH_RESULT_TPL = """
+**{rank}. {title}**  
+*Relevance: {score:.2f}*  
+{excerpt}...  
+[Read full article]({url})
 
 ---
 """
 
+def format_article_for_display(article: Article) -> str:
+    """Format an article for display in the UI."""
+    return _ARTICLE_TPL.format_map({
+        "title": article.title,
+        "url": article.url,
+        "author": f"by {article.author}" if article.author else "",
+        "published": article.publish_date.strftime(_DATE_FMT) if article.publish_date else "Date unknown",
+        "added": article.date_added.strftime(_DATETIME_FMT),
+        "word_count": article.word_count,
+        "tags": ", ".join(article.tags) if article.tags else "No tags",
+        "summary": article.summary or "No summary available",
+    })
+
 def format_search_results(results) -> str:
     """Format search results for display."""
     if not results:
         return "No results found."
     
-    output = []
+    output = io.StringIO()
     for i, result in enumerate(results, 1):
-        output.append(f"""
-**{i}. {result.article_title}**  
-*Relevance: {result.score:.2f}*  
-{result.chunk_text[:300]}...  
-[Read full article]({result.article_url})
-
----
-""")
+        if i > 1:
+            output.write("\n")
+        output.write(_SEARCH_RESULT_TPL.format_map({
+            "rank": i,
+            "title": result.article_title,
+            "score": result.score,
+            "excerpt": result.chunk_text[:300],
+            "url": result.article_url,
+        }))
     
-    return "\n".join(output)
+    return output.getvalue()
 
 # ============================================================================
 # Tab 1: Add Article
 # ============================================================================
 
-def add_article(url: str, progress=gr.Progress()) -> Tuple[str, str]:
+async def add_article(urls: str, progress=gr.Progress()) -> Tuple[str, str]:
     """
-    Add an article from URL.
+    Add one or more articles from URLs (one per line).
+    
+    Ingestion runs in a worker thread so the event loop stays free, and
+    several URLs are fetched concurrently. Articles are indexed for
+    search in the background after they are saved.
     
     Returns:
         Tuple of (status_message, article_preview)
     """
-    if not url or not url.strip():
+    url_list = [url.strip() for url in (urls or "").splitlines() if url.strip()]
+    if not url_list:
         return "❌ Please enter a URL", ""
     
-    url = url.strip()
-    
     try:
-        progress(0.2, desc="Fetching article...")
-        
-        # Ingest the article
-        success, message, article = ingestion_service.ingest_article(url)
+        progress(0.2, desc="Fetching article..." if len(url_list) == 1 else f"Fetching {len(url_list)} articles...")
         
-        if not success:
-            return f"❌ {message}", ""
+        # Ingest the articles
+        results = await asyncio.to_thread(ingestion_service.ingest_articles, url_list, True)
         
         progress(1.0, desc="Complete!")
         
-        # Format article for display
-        article_display = format_article_for_display(article)
+        statuses = []
+        previews = []
+        for url, result in zip(url_list, results):
+            prefix = f"{url}: " if len(url_list) > 1 else ""
+            success, message, article = result
+            if not success:
+                statuses.append(f"❌ {prefix}{message}")
+                continue
+            
+            # Format article for display
+            statuses.append(f"✅ {message}")
+            previews.append(format_article_for_display(article))
         
-        return f"✅ {message}", article_display
+        return "\n\n".join(statuses), "\n".join(previews)
         
     except Exception as e:
         return f"❌ Error: {str(e)}", ""
@@ -95,23 +120,46 @@ def add_article(url: str, progress=gr.Progress()) -> Tuple[str, str]:
 # Tab 2: Library
 # ============================================================================
 
-def load_library() -> str:
-    """Load and display all articles in the library."""
+def load_library(limit: int = 50, after: Optional[Tuple[str, str]] = None) -> Iterator[Tuple[str, Optional[Tuple[str, str]]]]:
+    """
+    Load a page of the library and stream it to the UI in batches of articles.
+    
+    Yields:
+        Tuples of (library_markdown, cursor for the next page or None)
+    """
     try:
-        articles = database_service.get_all_articles(limit=50)
+        limit = int(limit)
+        articles = database_service.get_all_articles(limit=limit, after=after)
         
         if not articles:
-            return "Your library is empty. Add some articles to get started!"
+            yield "Your library is empty. Add some articles to get started!", None
+            return
         
-        output = [f"# Your Research Library ({len(articles)} articles)\n"]
+        # A full page means there may be older articles to page to
+        last = articles[-1]
+        next_cursor = (last.date_added.isoformat(), last.id) if len(articles) == limit else None
         
-        for article in articles:
-            output.append(format_article_for_display(article))
+        # Gradio re-sends and re-renders the whole Markdown with each yield,
+        # so the first articles show up early but the page is only yielded
+        # once per batch rather than once per article
+        parts = [f"# Your Research Library ({len(articles)} articles)\n"]
+        yield parts[0], next_cursor
         
-        return "\n".join(output)
+        for i, article in enumerate(articles, 1):
+            parts.append(format_article_for_display(article))
+            if i % _LIBRARY_STREAM_BATCH == 0 or i == len(articles):
+                yield "\n".join(parts), next_cursor
         
     except Exception as e:
-        return f"Error loading library: {str(e)}"
+        yield f"Error loading library: {str(e)}", None
+
+def load_next_page(limit: int, cursor: Optional[Tuple[str, str]]) -> Iterator[Tuple[str, Optional[Tuple[str, str]]]]:
+    """Stream the page of articles older than the cursor."""
+    if not cursor:
+        yield "No more articles in your library.", None
+        return
+    
+    yield from load_library(limit, after=cursor)
 
 def search_library(query: str) -> str:
     """Search the library for articles."""
@@ -225,9 +273,9 @@ with gr.Blocks() as app:
             with gr.Row():
                 with gr.Column(scale=3):
                     url_input = gr.Textbox(
-                        label="Article URL",
-                        placeholder="https://example.com/article",
-                        lines=1
+                        label="Article URL(s)",
+                        placeholder="https://example.com/article\n(one URL per line to add several)",
+                        lines=3
                     )
                 with gr.Column(scale=1):
                     add_btn = gr.Button("Add Article", variant="primary", size="lg")
@@ -244,8 +292,9 @@ with gr.Blocks() as app:
             gr.Markdown("""
             **Tips:**
             - Paste any article URL from blogs, news sites, or research papers
+            - Add several articles at once by putting one URL per line
             - The system will automatically extract content, generate a summary, and index it for search
-            - Processing typically takes 10-30 seconds
+            - Processing typically takes 10-30 seconds; search indexing finishes in the background
             """)
         
         # ========== Tab 2: Library ==========
@@ -262,12 +311,30 @@ with gr.Blocks() as app:
                     search_btn = gr.Button("Search", variant="primary")
                 
             library_output = gr.Markdown(label="Library Contents")
+            library_cursor = gr.State(None)
             
             # Load library on tab open
-            load_btn = gr.Button("Refresh Library", variant="secondary")
+            with gr.Row():
+                limit_slider = gr.Slider(
+                    minimum=10,
+                    maximum=200,
+                    value=50,
+                    step=10,
+                    label="Articles to show"
+                )
+                load_btn = gr.Button("Refresh Library", variant="secondary")
+                next_btn = gr.Button("Next Page", variant="secondary")
             load_btn.click(
                 fn=load_library,
-                outputs=[library_output]
+                inputs=[limit_slider],
+                outputs=[library_output, library_cursor],
+                show_progress="hidden"
+            )
+            next_btn.click(
+                fn=load_next_page,
+                inputs=[limit_slider, library_cursor],
+                outputs=[library_output, library_cursor],
+                show_progress="hidden"
             )
             
             search_btn.click(
@@ -277,7 +344,12 @@ with gr.Blocks() as app:
             )
             
             # Auto-load on startup
-            app.load(fn=load_library, outputs=[library_output])
+            app.load(
+                fn=load_library,
+                inputs=[limit_slider],
+                outputs=[library_output, library_cursor],
+                show_progress="hidden"
+            )
         
         # ========== Tab 3: Query ==========
         with gr.Tab("💬 Ask Questions"):
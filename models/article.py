@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel, HttpUrl, Field
+import numpy as np
+from pydantic import BaseModel, ConfigDict, HttpUrl, Field, field_serializer
 from uuid import uuid4
 
 class Article(BaseModel):
@@ -12,30 +13,30 @@ class Article(BaseModel):
     date_added: datetime = Field(default_factory=datetime.now)
     content: str
     summary: Optional[str] = None
-    tags: List[str] = Field(default_factory=List)
+    tags: List[str] = Field(default_factory=list)
     read_status: bool = False
     word_count: int = 0
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_serializer('publish_date', 'date_added', when_used='json')
+    def _serialize_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
 
 class ArticleChunk(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str = Field(default_factory=lambda: str(uuid4()))
     article_id: str
     chunk_index: int
     text: str
-    embedding: Optional[List[float]] = None
+    embedding: Optional[np.ndarray] = None
     article_title: str
     article_url: str
     article_author: Optional[str] = None
     article_date: Optional[datetime] = None
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_serializer('article_date', when_used='json')
+    def _serialize_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
 
 class ArticleMetadata(BaseModel):
     title: str
@@ -43,13 +44,13 @@ class ArticleMetadata(BaseModel):
     publish_date: Optional[datetime] = None
     description: Optional[str] = None
     keywords: List[str] = Field(default_factory=list)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+
+    @field_serializer('publish_date', when_used='json')
+    def _serialize_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
 
 class SearchResult(BaseModel):
+    chunk_id: Optional[str] = None
     article_id: str
     article_title: str
     article_url: str
@@ -62,9 +63,7 @@ class QueryResponse(BaseModel):
     sources: List[SearchResult]
     query: str
     timestamp: datetime = Field(default_factory=datetime.now)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
+    @field_serializer('timestamp', when_used='json')
+    def _serialize_datetime(self, value: datetime) -> str:
+        return value.isoformat()
@@ -1,70 +1,110 @@
 import sqlite3
 import json
-from typing import List, Optional, Dict, Any
+import queue
+import re
+from contextlib import contextmanager
+import numpy as np
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from pinecone import Pinecone, ServerlessSpec
 from models import Article, ArticleChunk, SearchResult
 from services.embedding_service import embedding_service
+from services.vector_store import PineconeVectorStore, FaissVectorStore, SqliteVecVectorStore, _build_results
 from utils.config import config
+from utils.text_processing import url_hash
+
+# Connections kept open for reuse; extra ones are opened under load and
+# closed again when they are returned to a full pool
+SQLITE_POOL_SIZE = 8
+
+# Words of a keyword query, each matched as a quoted FTS5 string
+FTS_TERM = re.compile(r"\w+")
+
+VECTOR_STORES = {
+    "pinecone": PineconeVectorStore,
+    "faiss": FaissVectorStore,
+    "sqlite-vec": SqliteVecVectorStore,
+}
 
 class DatabaseService:
     
     def __init__(self):
-        self.pc = None
-        self.index = None
-        self.conn = None
-        self._init_pinecone()
+        self.vector_store = None
+        self.db_path = None
+        self._pool = queue.Queue(maxsize=SQLITE_POOL_SIZE)
+        
+        backend = config.VECTOR_BACKEND
+        if backend not in VECTOR_STORES:
+            raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+        self._store_class = VECTOR_STORES[backend]
+        
         self._init_sqlite()
+        self._init_vector_store()
     
-    def _init_pinecone(self):
+    def _init_vector_store(self):
         try:
-            self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
-            
-            # Check if index exists, create if not
-            index_name = config.PINECONE_INDEX_NAME
-            existing_indexes = [idx.name for idx in self.pc.list_indexes()]
-            
-            if index_name not in existing_indexes:
-                print(f"Creating Pinecone index: {index_name}")
-
-                dimension = embedding_service.embedding_dimension
-                
-                self.pc.create_index(
-                    name=index_name,
-                    dimension=dimension,
-                    metric="cosine",
-                    spec=ServerlessSpec(
-                        cloud="aws",
-                        region="us-east-1"
-                    )
-                )
-                print(f"Index created successfully")
-            
-            self.index = self.pc.Index(index_name)
-            print(f"Connected to Pinecone index: {index_name}")
+            dimension = embedding_service.embedding_dimension
+            with self._conn() as conn:
+                self.vector_store = self._store_class(dimension, conn)
             
         except Exception as e:
-            print(f"Error initializing Pinecone: {e}")
+            print(f"Error initializing vector store: {e}")
             raise
     
     def _init_sqlite(self):
         try:
-            config.ensure_directories()
-            db_path = config.DATA_DIR / "research_assistant.db"
-            
-            self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
+            self.db_path = config.DATA_DIR / "research_assistant.db"
             
             # Create tables
-            self._create_tables()
-            print(f"Connected to SQLite database: {db_path}")
+            with self._conn() as conn:
+                self._create_tables(conn)
+            print(f"Connected to SQLite database: {self.db_path}")
             
         except Exception as e:
             print(f"Error initializing SQLite: {e}")
             raise
     
-    def _create_tables(self):
-        cursor = self.conn.cursor()
+    def _connect(self) -> sqlite3.Connection:
+        # A pooled connection is only used by one thread at a time, but not
+        # always by the thread that opened it
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        
+        # WAL lets reads proceed during writes and, with synchronous=NORMAL,
+        # avoids an fsync on every commit
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        # Enforce the chunks -> articles cascade declared in the schema
+        conn.execute("PRAGMA foreign_keys=ON")
+        
+        self._store_class.prepare_connection(conn)
+        return conn
+    
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """Check a connection out of the pool; uncommitted work is rolled back on error."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        
+        try:
+            yield conn
+        except Exception:
+            if self.vector_store is not None:
+                self.vector_store.rollback(conn)
+            else:
+                conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
         
         # Articles table
         cursor.execute("""
@@ -79,9 +119,35 @@ class DatabaseService:
                 summary TEXT,
                 tags TEXT,
                 read_status INTEGER DEFAULT 0,
-                word_count INTEGER DEFAULT 0
+                word_count INTEGER DEFAULT 0,
+                url_hash TEXT
+            )
+        """)
+        
+        # Key of the normalized URL, so links that differ only in tracking
+        # parameters or letter case are recognised as the same article
+        cursor.execute("PRAGMA table_info(articles)")
+        if 'url_hash' not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE articles ADD COLUMN url_hash TEXT")
+        # The index is unique so concurrent ingests of the same article
+        # cannot both insert it. Libraries from before it was unique may
+        # hold duplicates; only the oldest copy keeps its key.
+        cursor.execute("""
+            UPDATE articles SET url_hash = NULL
+            WHERE url_hash IS NOT NULL AND rowid NOT IN (
+                SELECT MIN(rowid) FROM articles WHERE url_hash IS NOT NULL GROUP BY url_hash
             )
         """)
+        cursor.execute("DROP INDEX IF EXISTS idx_articles_url_hash")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_url_hash_unique
+            ON articles(url_hash)
+        """)
+        cursor.execute("SELECT id, url FROM articles WHERE url_hash IS NULL")
+        cursor.executemany(
+            "UPDATE OR IGNORE articles SET url_hash = ? WHERE id = ?",
+            [(url_hash(row['url']), row['id']) for row in cursor.fetchall()]
+        )
         
         # Chunks table (for reference)
         cursor.execute("""
@@ -94,109 +160,232 @@ class DatabaseService:
             )
         """)
         
-        self.conn.commit()
+        # Lets delete_article find an article's chunks without a table scan
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_article
+            ON chunks(article_id)
+        """)
+        
+        # Newest-first listing is served straight from this index; id breaks
+        # ties between articles saved with the same timestamp
+        cursor.execute("DROP INDEX IF EXISTS idx_articles_date")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_articles_date_id
+            ON articles(date_added DESC, id DESC)
+        """)
+        
+        # Full-text index over chunk text, kept in sync with `chunks` by
+        # triggers. Chunk writes must use upserts rather than INSERT OR
+        # REPLACE, whose implicit delete does not fire the delete trigger.
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'")
+        fts_exists = cursor.fetchone() is not None
+        
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts
+            USING fts5(text, content='chunks', content_rowid='rowid')
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+                INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+            END
+        """)
+        
+        # Index chunks saved before the full-text table existed
+        if not fts_exists:
+            cursor.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+        
+        conn.commit()
     
     def save_article(self, article: Article) -> bool:
+        """
+        Insert or update an article.
+
+        Returns False without writing if a different article already has
+        the same normalized URL.
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO articles 
-                (id, url, title, author, publish_date, date_added, content, 
-                 summary, tags, read_status, word_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                article.id,
-                article.url,
-                article.title,
-                article.author,
-                article.publish_date.isoformat() if article.publish_date else None,
-                article.date_added.isoformat(),
-                article.content,
-                article.summary,
-                json.dumps(article.tags),
-                1 if article.read_status else 0,
-                article.word_count
-            ))
-            self.conn.commit()
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                # An upsert rather than INSERT OR REPLACE: replacing the row
+                # would cascade-delete the article's chunks
+                cursor.execute("""
+                    INSERT INTO articles 
+                    (id, url, title, author, publish_date, date_added, content, 
+                     summary, tags, read_status, word_count, url_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        url = excluded.url,
+                        title = excluded.title,
+                        author = excluded.author,
+                        publish_date = excluded.publish_date,
+                        date_added = excluded.date_added,
+                        content = excluded.content,
+                        summary = excluded.summary,
+                        tags = excluded.tags,
+                        read_status = excluded.read_status,
+                        word_count = excluded.word_count,
+                        url_hash = excluded.url_hash
+                    ON CONFLICT(url_hash) DO NOTHING
+                """, (
+                    article.id,
+                    article.url,
+                    article.title,
+                    article.author,
+                    article.publish_date.isoformat() if article.publish_date else None,
+                    article.date_added.isoformat(),
+                    article.content,
+                    article.summary,
+                    json.dumps(article.tags),
+                    1 if article.read_status else 0,
+                    article.word_count,
+                    url_hash(article.url)
+                ))
+                conn.commit()
+            if cursor.rowcount == 0:
+                print(f"Article already exists: {article.url}")
+                return False
             return True
         except Exception as e:
             print(f"Error saving article to SQLite: {e}")
             return False
     
-    def save_chunks_to_pinecone(self, chunks: List[ArticleChunk]) -> bool:
+    def save_chunks(self, chunks: List[ArticleChunk]) -> bool:
         try:
-            vectors = []
-            for chunk in chunks:
-                metadata = {
-                    "article_id": chunk.article_id,
-                    "chunk_index": chunk.chunk_index,
-                    "text": chunk.text,
-                    "article_title": chunk.article_title,
-                    "article_url": chunk.article_url,
-                    "article_author": chunk.article_author or "",
-                    "article_date": chunk.article_date.isoformat() if chunk.article_date else "",
-                }
+            with self._conn() as conn:
+                self.vector_store.save_chunks(conn, chunks)
                 
-                vectors.append({
-                    "id": chunk.id,
-                    "values": chunk.embedding,
-                    "metadata": metadata
-                })
-            
-            # Upsert to Pinecone
-            self.index.upsert(vectors=vectors)
-            
-            # Also save chunk references to SQLite
-            cursor = self.conn.cursor()
-            for chunk in chunks:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO chunks (id, article_id, chunk_index, text)
+                # Also save chunk references to SQLite
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO chunks (id, article_id, chunk_index, text)
                     VALUES (?, ?, ?, ?)
-                """, (chunk.id, chunk.article_id, chunk.chunk_index, chunk.text))
-            self.conn.commit()
+                    ON CONFLICT(id) DO UPDATE SET
+                        article_id = excluded.article_id,
+                        chunk_index = excluded.chunk_index,
+                        text = excluded.text
+                """, [(chunk.id, chunk.article_id, chunk.chunk_index, chunk.text) for chunk in chunks])
+                self.vector_store.commit(conn)
             
             return True
         except Exception as e:
-            print(f"Error saving chunks to Pinecone: {e}")
+            print(f"Error saving chunks to vector store: {e}")
             return False
     
-    def query_pinecone(
+    def query_chunks(
         self, 
-        query_embedding: List[float], 
+        query_embedding: np.ndarray, 
         top_k: int = None,
         filter_dict: Dict[str, Any] = None
     ) -> List[SearchResult]:
         try:
             top_k = top_k or config.TOP_K_RESULTS
+            with self._conn() as conn:
+                return self.vector_store.query(conn, query_embedding, top_k, filter_dict)
+        except Exception as e:
+            print(f"Error querying vector store: {e}")
+            return []
+    
+    def article_embedding(self, article_id: str) -> Optional[np.ndarray]:
+        """
+        Unit-length mean of an article's stored chunk vectors.
+        
+        Returns None if the article has no indexed chunks, e.g. while it is
+        still being indexed in the background.
+        """
+        try:
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM chunks WHERE article_id = ?", (article_id,))
+                chunk_ids = [row['id'] for row in cursor.fetchall()]
+                if not chunk_ids:
+                    return None
+                embeddings = self.vector_store.fetch_embeddings(conn, chunk_ids)
+            if not embeddings:
+                return None
             
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                include_metadata=True,
-                filter=filter_dict
-            )
+            vectors = np.stack(list(embeddings.values()))
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            centroid = vectors.mean(axis=0)
+            return centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+        except Exception as e:
+            print(f"Error fetching article embedding: {e}")
+            return None
+    
+    def chunk_embeddings(self, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of whichever of `chunk_ids` are indexed, keyed by chunk id."""
+        if not chunk_ids:
+            return {}
+        try:
+            with self._conn() as conn:
+                return self.vector_store.fetch_embeddings(conn, chunk_ids)
+        except Exception as e:
+            print(f"Error fetching chunk embeddings: {e}")
+            return {}
+    
+    def count_chunks(self, article_id: str) -> int:
+        try:
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM chunks WHERE article_id = ?", (article_id,))
+                return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"Error counting chunks: {e}")
+            return 0
+    
+    def keyword_search(
+        self,
+        query: str,
+        top_k: int = None,
+        filter_dict: Dict[str, Any] = None
+    ) -> List[SearchResult]:
+        """Full-text search over chunk text, ranked by BM25; matches any word of the query."""
+        try:
+            top_k = top_k or config.TOP_K_RESULTS
+            terms = FTS_TERM.findall(query)
+            if not terms:
+                return []
+            match = " OR ".join(f'"{term}"' for term in terms)
             
-            search_results = []
-            for match in results.matches:
-                search_results.append(SearchResult(
-                    article_id=match.metadata.get("article_id", ""),
-                    article_title=match.metadata.get("article_title", ""),
-                    article_url=match.metadata.get("article_url", ""),
-                    chunk_text=match.metadata.get("text", ""),
-                    score=match.score,
-                    metadata=match.metadata
-                ))
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                # Over-fetch so filtered-out chunks still leave top_k hits
+                cursor.execute("""
+                    SELECT c.id AS chunk_id, c.article_id, c.chunk_index, c.text,
+                           a.title, a.url, a.author, a.publish_date,
+                           bm25(chunks_fts) AS rank
+                    FROM chunks_fts
+                    JOIN chunks c ON c.rowid = chunks_fts.rowid
+                    JOIN articles a ON a.id = c.article_id
+                    WHERE chunks_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                """, (match, top_k * 2))
+                rows = {row['chunk_id']: row for row in cursor.fetchall()}
             
-            return search_results
+            # bm25() is lower-is-better; flip it so higher scores rank first
+            hits = [(chunk_id, -row['rank']) for chunk_id, row in rows.items()]
+            return _build_results(hits, rows, top_k, filter_dict)
         except Exception as e:
-            print(f"Error querying Pinecone: {e}")
+            print(f"Error running keyword search: {e}")
             return []
     
     def get_article_by_id(self, article_id: str) -> Optional[Article]:
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM articles WHERE id = ?", (article_id,))
-            row = cursor.fetchone()
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM articles WHERE id = ?", (article_id,))
+                row = cursor.fetchone()
             
             if row:
                 return Article(
@@ -217,17 +406,35 @@ class DatabaseService:
             print(f"Error getting article: {e}")
             return None
     
-    def get_all_articles(self, limit: int = 100, offset: int = 0) -> List[Article]:
+    def get_all_articles(self, limit: int = 100, after: Optional[Tuple[str, str]] = None) -> List[Article]:
+        """
+        List articles newest first using keyset pagination.
+
+        Args:
+            limit: Maximum number of articles to return
+            after: (ISO-8601 date_added, id) of the last article on the
+                previous page; only articles after it are returned
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT * FROM articles 
-                ORDER BY date_added DESC 
-                LIMIT ? OFFSET ?
-            """, (limit, offset))
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                if after:
+                    cursor.execute("""
+                        SELECT * FROM articles 
+                        WHERE (date_added, id) < (?, ?)
+                        ORDER BY date_added DESC, id DESC 
+                        LIMIT ?
+                    """, (*after, limit))
+                else:
+                    cursor.execute("""
+                        SELECT * FROM articles 
+                        ORDER BY date_added DESC, id DESC 
+                        LIMIT ?
+                    """, (limit,))
+                rows = cursor.fetchall()
             
             articles = []
-            for row in cursor.fetchall():
+            for row in rows:
                 articles.append(Article(
                     id=row['id'],
                     url=row['url'],
@@ -249,29 +456,51 @@ class DatabaseService:
     
     def delete_article(self, article_id: str) -> bool:
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM articles WHERE id = ?", (article_id,))
-            cursor.execute("DELETE FROM chunks WHERE article_id = ?", (article_id,))
-            self.conn.commit()
-            
-            # Delete from Pinecone (delete by metadata filter)
-            # Note: This requires fetching chunk IDs first
-            cursor.execute("SELECT id FROM chunks WHERE article_id = ?", (article_id,))
-            chunk_ids = [row['id'] for row in cursor.fetchall()]
-            
-            if chunk_ids:
-                self.index.delete(ids=chunk_ids)
-            
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                
+                # RETURNING hands back the deleted chunk IDs so the vectors can be removed too
+                cursor.execute("DELETE FROM chunks WHERE article_id = ? RETURNING id", (article_id,))
+                chunk_ids = [row['id'] for row in cursor.fetchall()]
+                
+                cursor.execute("DELETE FROM articles WHERE id = ?", (article_id,))
+                
+                if chunk_ids:
+                    self.vector_store.delete(conn, chunk_ids)
+                
+                self.vector_store.commit(conn)
             return True
         except Exception as e:
             print(f"Error deleting article: {e}")
             return False
     
+    def library_version(self) -> str:
+        """
+        Fingerprint of the library contents.
+
+        Changes whenever articles are added or removed, and again when an
+        article's chunks are stored, since background indexing saves the
+        article row before its chunks are searchable.
+        """
+        try:
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT (SELECT COUNT(*) FROM articles), (SELECT MAX(date_added) FROM articles),
+                           (SELECT COUNT(*) FROM chunks), (SELECT MAX(rowid) FROM chunks)
+                """)
+                count, latest, chunk_count, latest_chunk = cursor.fetchone()
+            return f"{count}:{latest or ''}:{chunk_count}:{latest_chunk or 0}"
+        except Exception as e:
+            print(f"Error reading library version: {e}")
+            return ""
+    
     def article_exists(self, url: str) -> bool:
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id FROM articles WHERE url = ?", (url,))
-            return cursor.fetchone() is not None
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1 FROM articles WHERE url_hash = ?", (url_hash(url),))
+                return cursor.fetchone() is not None
         except Exception as e:
             print(f"Error checking article existence: {e}")
             return False
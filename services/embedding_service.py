@@ -1,63 +1,172 @@
-from typing import List, Union
+import asyncio
+import hashlib
+import random
+from functools import cached_property, lru_cache
+from typing import Iterator, List
 import numpy as np
 import voyageai
+from utils.async_utils import run_sync
+from utils.cache import KeyValueCache
 from utils.config import config
-from utils.text_processing import chunk_text
+from utils.text_processing import _token_counts, chunk_texts
+
+# Upper bound, in seconds, on the random delay before each batch after the
+# first, so a long article does not open EMBED_CONCURRENCY requests at once
+# and trip the rate limiter
+EMBED_START_JITTER = 0.2
 
 class EmbeddingService:
     def __init__(self):
         self.model_name = config.EMBEDDING_MODEL
-        self.model = None
-        self._load_model()
 
-    def _load_model(self):
+        # Every embedding is cached on disk by content hash, so repeat
+        # queries and re-ingested chunks skip the API; query embeddings are
+        # additionally kept in memory by exact text
+        self._cache = KeyValueCache("embeddings")
+        self._cached_query_embedding = lru_cache(maxsize=config.QUERY_CACHE_SIZE)(self._embed_query)
+
+    @cached_property
+    def async_model(self) -> voyageai.AsyncClient:
+        # Created on first use so importing the service (and the Library and
+        # Add Article tabs) never waits on the embedding client
         try:
-            self.use_openai = False
             print(f"Loading embedding model: {self.model_name}")
-            self.model = voyageai.Client(api_key=config.VOYAGEAI_API_KEY)
+            model = voyageai.AsyncClient(api_key=config.VOYAGEAI_API_KEY)
             print("Embedding model loaded successfully")
+            return model
         except Exception as e:
             print(f"Error loading embedding model: {e}")
             raise
 
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         try:
-            result = self.model.embed(
-                text,
-                self.model_name
-            )
-            return result.embeddings
-        except Exception as e:
-            print(f"Error generating embedding:{e}")
+            return self._cached_query_embedding(text)
+        except RuntimeError:
+            return None
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        embeddings = self.generate_embeddings([text], input_type="query")
+        if embeddings is None:
+            # Raised rather than returned so lru_cache does not keep the failure
+            raise RuntimeError(f"Embedding failed for query: {text[:50]}")
+        embedding = embeddings[0]
+
+        # The same array is handed to every caller of a cached query
+        embedding.setflags(write=False)
+        return embedding
+
+    def _cache_key(self, text: str, input_type: str) -> str:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{digest}:{self.model_name}:{input_type}"
+
+    def _iter_batches(self, texts: List[str]) -> Iterator[List[int]]:
+        """
+        Greedily pack texts into request-sized batches of indices.
+
+        A batch holds at most EMBED_BATCH_SIZE texts and EMBED_MAX_BATCH_TOKENS
+        tokens, the per-request limits of the Voyage embed endpoint. A text
+        that alone exceeds the token budget is sent on its own.
+        """
+        batch, batch_tokens = [], 0
+        # Counted in a single batch tokenizer call rather than once per text
+        for i, tokens in enumerate(_token_counts(texts).tolist()):
+            if batch and (len(batch) >= config.EMBED_BATCH_SIZE
+                          or batch_tokens + tokens > config.EMBED_MAX_BATCH_TOKENS):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            yield batch
         
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def generate_embeddings(self, texts: List[str], input_type: str = "document") -> np.ndarray:
+        """
+        Embed texts into a single float32 matrix of shape (len(texts), dim).
+
+        Rows are L2-normalized, so cosine similarity between embeddings is
+        a plain dot product. `input_type` is "document" for stored chunks
+        and "query" for search queries.
+        """
         try:
-            result = self.model.embed(
-                texts,
-                self.model_name
-            )
-            return result.embeddings
+            embeddings = np.empty((len(texts), self.embedding_dimension), dtype=np.float32)
+
+            keys = [self._cache_key(text, input_type) for text in texts]
+            cached = self._cache.get_many(keys)
+            misses = []
+            for i, key in enumerate(keys):
+                if key in cached:
+                    embeddings[i] = np.frombuffer(cached[key], dtype=np.float32)
+                else:
+                    misses.append(i)
+
+            # A batch runs at the pace of its longest text, so batch texts of
+            # similar length together; rows still land at their own index
+            misses.sort(key=lambda i: len(texts[i]), reverse=True)
+
+            # One request per batch rather than per text, several in flight at once
+            batches = [
+                [misses[j] for j in positions]
+                for positions in self._iter_batches([texts[i] for i in misses])
+            ]
+            if batches:
+                results = run_sync(self._aembed_batches(
+                    [[texts[i] for i in batch] for batch in batches], input_type
+                ))
+
+                for batch, vectors in zip(batches, results):
+                    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                    embeddings[batch] = vectors
+                self._cache.set_many((keys[i], embeddings[i].tobytes()) for i in misses)
+
+            return embeddings
         except Exception as e:
             print(f"Error generating embedding:{e}")
     
+    async def _aembed_batches(self, batches: List[List[str]], input_type: str) -> List[np.ndarray]:
+        """Embed batches concurrently, at most EMBED_CONCURRENCY at a time; results keep batch order."""
+        semaphore = asyncio.Semaphore(config.EMBED_CONCURRENCY)
+
+        async def embed(i: int, batch: List[str]) -> np.ndarray:
+            if i:
+                await asyncio.sleep(random.uniform(0, EMBED_START_JITTER))
+            async with semaphore:
+                result = await self.async_model.embed(batch, self.model_name, input_type=input_type)
+            return np.asarray(result.embeddings, dtype=np.float32)
+
+        return await asyncio.gather(*(embed(i, batch) for i, batch in enumerate(batches)))
+    
     def chunk_and_embed(
             self,
             text: str,
             chunk_size: int = None,
             chunk_overlap: int = None,
     ) -> List[dict]:
+        return self.chunk_and_embed_many([text], chunk_size, chunk_overlap)[0]
+
+    def chunk_and_embed_many(
+            self,
+            texts: List[str],
+            chunk_size: int = None,
+            chunk_overlap: int = None,
+    ) -> List[List[dict]]:
+        """Chunk several texts and embed all of their chunks in one pass of batched requests."""
         chunk_size = chunk_size or config.CHUNK_SIZE
         chunk_overlap = chunk_overlap or config.CHUNK_OVERLAP
 
-        chunks = chunk_text(text, chunk_size, chunk_overlap)
+        chunk_lists = chunk_texts(texts, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
-        chunk_texts = [chunk['text'] for chunk in chunks]
-        embeddings = self.generate_embeddings(chunk_texts)
+        texts_to_embed = [chunk['text'] for chunks in chunk_lists for chunk in chunks]
+        embeddings = self.generate_embeddings(texts_to_embed)
+        if embeddings is None:
+            raise RuntimeError("Error generating embeddings")
 
-        for chunk, embedding in zip(chunks, embeddings):
+        # Each chunk keeps a row view into the embedding matrix; rows are
+        # only converted to Python lists when they are sent to Pinecone.
+        all_chunks = (chunk for chunks in chunk_lists for chunk in chunks)
+        for chunk, embedding in zip(all_chunks, embeddings):
             chunk['embedding'] = embedding
 
-        return chunks
+        return chunk_lists
     
     @property
     def embedding_dimension(self) -> int:
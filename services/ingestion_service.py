@@ -1,23 +1,67 @@
 """Service for ingesting articles from URLs using Playwright for better compatibility."""
-from playwright.sync_api import sync_playwright, Browser, Page, TimeoutError as PlaywrightTimeout
-from bs4 import BeautifulSoup
+from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page, TimeoutError as PlaywrightTimeout
+from selectolax.lexbor import LexborHTMLParser
 import trafilatura
+import asyncio
+from anthropic import AsyncAnthropic
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Tuple
+from functools import cached_property
+import queue
+import re
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 import validators
 import time
 from models import Article, ArticleChunk, ArticleMetadata
 from services.embedding_service import embedding_service
 from services.database_service import database_service
-from utils.text_processing import clean_text, extract_keywords
+from utils.async_utils import run_sync
+from utils.llm_cache import acached_completion
+from utils.text_processing import clean_text, extract_keywords, normalize_url
 from utils.config import config
 
+# Requests that never affect the extracted text; aborting them keeps page
+# loads to the document and its scripts
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Fast extractions shorter than this are likely boilerplate, so the page is
+# extracted again with the readability/justext fallbacks competing
+EXTRACT_FALLBACK_MIN_CHARS = 500
+
+def _block_assets(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+class _BrowserWorker:
+    """
+    A Playwright browser and the one thread allowed to drive it.
+
+    Sync Playwright objects may only be used from the thread that created
+    them, so each browser has its own single-thread executor.
+    """
+    def __init__(self, index: int):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"playwright-{index}")
+        self.playwright = None
+        self.browser = None
+        self.context = None
+
 class IngestionService:
     def __init__(self):
       #Initialize the ingestion service with Playwright
-        self.playwright = None
-        self.browser = None
+        # Up to INGEST_CONCURRENCY pages load at once, each in its own
+        # browser. Browsers launch on first use, and the LIFO queue keeps
+        # one-off fetches on a browser that is already running.
+        self._browser_workers = [_BrowserWorker(i) for i in range(config.INGEST_CONCURRENCY)]
+        self._idle_browser_workers = queue.LifoQueue()
+        for worker in reversed(self._browser_workers):
+            self._idle_browser_workers.put(worker)
+        # Chunking, embedding and vector upserts for background ingests
+        self._index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexing")
         self._init_browser()
     
     def _init_browser(self):
@@ -25,13 +69,13 @@ class IngestionService:
 
         pass
     
-    def _get_browser(self) -> Browser:
+    def _get_browser(self, worker: _BrowserWorker) -> Browser:
         #Get or create browser instance
-        if self.browser is None:
+        if worker.browser is None:
             print("Initializing Playwright browser...")
-            self.playwright = sync_playwright().start()
+            worker.playwright = sync_playwright().start()
 
-            self.browser = self.playwright.chromium.launch(
+            worker.browser = worker.playwright.chromium.launch(
                 headless=True,  # Run without opening window
                 args=[
                     '--disable-blink-features=AutomationControlled',  # Hide automation
@@ -40,19 +84,32 @@ class IngestionService:
                 ]
             )
             print("Browser ready!")
-        return self.browser
+        return worker.browser
     
-    def _fetch_with_playwright(self, url: str) -> Tuple[bool, str, str]:
-        try:
-            browser = self._get_browser()
-            context = browser.new_context(
+    def _get_context(self, worker: _BrowserWorker) -> BrowserContext:
+        # One long-lived context; creating a context per URL costs far more
+        # than opening a page in an existing one
+        if worker.context is None:
+            worker.context = self._get_browser(worker).new_context(
                 user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                 viewport={'width': 1920, 'height': 1080},
                 locale='en-US',
                 timezone_id='America/New_York'
             )
-            
-            page = context.new_page()
+            worker.context.route("**/*", _block_assets)
+        return worker.context
+    
+    def _fetch_with_playwright(self, url: str) -> Tuple[bool, str, str]:
+        worker = self._idle_browser_workers.get()
+        try:
+            return worker.executor.submit(self._fetch_page, worker, url).result()
+        finally:
+            self._idle_browser_workers.put(worker)
+    
+    def _fetch_page(self, worker: _BrowserWorker, url: str) -> Tuple[bool, str, str]:
+        page = None
+        try:
+            page = self._get_context(worker).new_page()
             
             # Navigate to the page
             print(f"Loading page: {url}")
@@ -60,26 +117,32 @@ class IngestionService:
             
             # Check response status
             if response and response.status >= 400:
-                context.close()
                 return False, "", f"HTTP {response.status} error"
             
-            # Wait a bit for JavaScript to load content
-            page.wait_for_timeout(2000)
+            # Give JavaScript-rendered content a chance to settle; pages
+            # that keep polling never go idle, so carry on after the timeout
+            try:
+                page.wait_for_load_state('networkidle', timeout=5000)
+            except PlaywrightTimeout:
+                pass
             
             # Get the HTML
             html = page.content()
             
-            # Close context
-            context.close()
-            
             return True, html, ""
             
         except PlaywrightTimeout:
             return False, "", "Page load timeout (30 seconds)"
         except Exception as e:
             return False, "", f"Browser error: {str(e)}"
+        finally:
+            if page is not None:
+                try:
+                    page.close()
+                except Exception:
+                    pass
     
-    def fetch_article(self, url: str) -> Tuple[bool, str, Optional[Article]]:
+    def fetch_article(self, url: str, summarize: bool = True) -> Tuple[bool, str, Optional[Article]]:
 
         if not validators.url(url):
             return False, "Invalid URL format", None
@@ -103,8 +166,10 @@ class IngestionService:
             
             content = clean_text(content)
             
-            print("Generating summary...")
-            summary = self._generate_summary(content)
+            summary = None
+            if summarize:
+                print("Generating summary...")
+                summary = self._generate_summaries([content])[0]
             
             keywords = extract_keywords(content, top_n=5)
             
@@ -125,55 +190,72 @@ class IngestionService:
             return False, f"Error processing article: {str(e)}", None
     
     def _extract_content(self, html: str, url: str) -> Tuple[str, ArticleMetadata]:
-        content = trafilatura.extract(
-            html,
-            include_comments=False,
-            include_tables=True,
-            no_fallback=False
-        )
+        # Parse once and share the tree between content and metadata extraction
+        page = trafilatura.load_html(html)
+        if page is None:
+            page = html
         
-
-        try:
-            soup = BeautifulSoup(html, 'lxml')
-        except:
-            soup = BeautifulSoup(html, 'html5lib')
-        
-        # Extract title
-        title = None
-        if soup.title:
-            title = soup.title.string
-        elif soup.find('meta', property='og:title'):
-            title = soup.find('meta', property='og:title')['content']
-        elif soup.find('h1'):
-            title = soup.find('h1').get_text()
-        
-        if not title:
-            title = urlparse(url).path.split('/')[-1] or "Untitled"
+        # The readability/justext fallbacks reparse the page, so they only
+        # run when the fast extraction finds too little to be the article
+        content = None
+        for fast in (True, False):
+            content = trafilatura.extract(
+                page,
+                include_comments=False,
+                include_tables=True,
+                fast=fast,
+                favor_precision=True
+            )
+            if content and len(content) >= EXTRACT_FALLBACK_MIN_CHARS:
+                break
         
-        # Extract author
-        author = None
-        author_meta = soup.find('meta', {'name': 'author'}) or \
-                     soup.find('meta', property='article:author')
-        if author_meta:
-            author = author_meta.get('content')
+        # trafilatura's metadata extraction covers most pages; the page is
+        # only scraped directly for fields it could not find
+        extracted = trafilatura.extract_metadata(page, default_url=url)
+        title = extracted.title if extracted else None
+        author = extracted.author if extracted else None
+        description = extracted.description if extracted else None
         
-        # Extract publish date
         publish_date = None
-        date_meta = soup.find('meta', property='article:published_time') or \
-                   soup.find('meta', {'name': 'publish_date'})
-        if date_meta:
+        if extracted and extracted.date:
             try:
-                date_str = date_meta.get('content')
-                publish_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            except:
+                publish_date = datetime.fromisoformat(extracted.date)
+            except ValueError:
                 pass
         
-        # Extract description
-        description = None
-        desc_meta = soup.find('meta', {'name': 'description'}) or \
-                   soup.find('meta', property='og:description')
-        if desc_meta:
-            description = desc_meta.get('content')
+        if not (title and author and publish_date and description):
+            tree = LexborHTMLParser(html)
+            metas = self._meta_tags(tree)
+            
+            # Extract title
+            if not title:
+                title_node = tree.css_first('title')
+                if title_node is not None:
+                    title = title_node.text(strip=True)
+                title = title or metas.get('og:title')
+                if not title:
+                    heading = tree.css_first('h1')
+                    title = heading.text(strip=True) if heading is not None else None
+            
+            # Extract author
+            if not author:
+                author = metas.get('author') or metas.get('article:author')
+            
+            # Extract publish date
+            if not publish_date:
+                date_str = metas.get('article:published_time') or metas.get('publish_date')
+                if date_str:
+                    try:
+                        publish_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+                    except ValueError:
+                        pass
+            
+            # Extract description
+            if not description:
+                description = metas.get('description') or metas.get('og:description')
+        
+        if not title:
+            title = urlparse(url).path.split('/')[-1] or "Untitled"
         
         metadata = ArticleMetadata(
             title=title.strip() if title else "Untitled",
@@ -184,50 +266,79 @@ class IngestionService:
         
         return content or "", metadata
     
-    def _generate_summary(self, content: str, max_length: int = 300) -> str:
+    @staticmethod
+    def _meta_tags(tree: LexborHTMLParser) -> Dict[str, str]:
+        """Map each meta tag's property or name (lowercased) to its content, first tag winning."""
+        metas = {}
+        for node in tree.css('meta'):
+            key = node.attributes.get('property') or node.attributes.get('name')
+            content = node.attributes.get('content')
+            if key and content:
+                metas.setdefault(key.lower(), content)
+        return metas
+    
+    @cached_property
+    def llm(self) -> AsyncAnthropic:
+        # One client, and so one connection pool, for every summary; created
+        # on first use and kept on the shared loop that run_sync drives
+        return AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
+    
+    async def _generate_summary_async(self, content: str) -> str:
+        # The opening sentences of a short piece already summarize it
+        if len(content.split()) < config.SUMMARY_LLM_MIN_WORDS:
+            return self._extractive_summary(content)
+        
         try:
-            from anthropic import Anthropic
-            
-            client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
-            
-            # Truncate content if too long (to fit in context)
-            max_content_length = 4000
-            if len(content) > max_content_length:
-                content = content[:max_content_length] + "..."
-            
-            prompt = f"""Provide a concise summary of the following article in 3-4 sentences. 
+            return await acached_completion(self.llm, config.LLM_MODEL, self._summary_prompt(content), max_tokens=200)
+        except Exception as e:
+            print(f"Error generating summary: {e}")
+            return self._extractive_summary(content)
+    
+    def _generate_summaries(self, contents: List[str]) -> List[str]:
+        """Summarize several articles with up to SUMMARY_CONCURRENCY requests in flight."""
+        return run_sync(self._agenerate_summaries(contents))
+    
+    async def _agenerate_summaries(self, contents: List[str]) -> List[str]:
+        semaphore = asyncio.Semaphore(config.SUMMARY_CONCURRENCY)
+        
+        async def summarize(content: str) -> str:
+            async with semaphore:
+                return await self._generate_summary_async(content)
+        
+        return await asyncio.gather(*(summarize(content) for content in contents))
+    
+    @staticmethod
+    def _summary_prompt(content: str) -> str:
+        # Truncate content if too long (to fit in context)
+        max_content_length = 4000
+        if len(content) > max_content_length:
+            content = content[:max_content_length] + "..."
+        
+        return f"""Provide a concise summary of the following article in 3-4 sentences. 
 Focus on the main points and key takeaways.
 
 Article:
 {content}
 
 Summary:"""
-            
-            message = client.messages.create(
-                model=config.LLM_MODEL,
-                max_tokens=200,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            summary = message.content[0].text.strip()
-            return summary
-            
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            # Fallback: return first few sentences
-            sentences = content.split('.')[:3]
-            return '. '.join(sentences) + '.'
     
-    def process_and_store_article(self, article: Article) -> Tuple[bool, str]:
-        try:
-            print("Chunking and embedding article...")
-            
-            chunks_with_embeddings = embedding_service.chunk_and_embed(
-                article.content,
-                chunk_size=config.CHUNK_SIZE,
-                chunk_overlap=config.CHUNK_OVERLAP
-            )
-            
+    @staticmethod
+    def _extractive_summary(content: str) -> str:
+        """The first three sentences of the article."""
+        sentences = SENTENCE_BOUNDARY.split(content[:4000].strip(), maxsplit=3)[:3]
+        return ' '.join(sentences)
+    
+    def _build_chunks_many(self, articles: List[Article]) -> List[List[ArticleChunk]]:
+        print("Chunking and embedding article..." if len(articles) == 1 else f"Chunking and embedding {len(articles)} articles...")
+        
+        chunk_lists = embedding_service.chunk_and_embed_many(
+            [article.content for article in articles],
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP
+        )
+        
+        article_chunk_lists = []
+        for article, chunks_with_embeddings in zip(articles, chunk_lists):
             article_chunks = []
             for chunk_data in chunks_with_embeddings:
                 chunk = ArticleChunk(
@@ -243,42 +354,145 @@ Summary:"""
                 article_chunks.append(chunk)
             
             print(f"Generated {len(article_chunks)} chunks")
+            article_chunk_lists.append(article_chunks)
+        return article_chunk_lists
+    
+    def process_and_store_article(self, article: Article, background: bool = False) -> Tuple[bool, str]:
+        """
+        Chunk, embed and store an article.
+        
+        With background=True only the article metadata is saved before
+        returning; chunking, embedding and the vector upsert run on the
+        indexing worker, and the article is removed again if that fails.
+        """
+        return self.process_and_store_articles([article], background=background)[0]
+    
+    def process_and_store_articles(self, articles: List[Article], background: bool = False) -> List[Tuple[bool, str]]:
+        """Like process_and_store_article, but the chunks of all articles are embedded together."""
+        try:
+            if background:
+                results = []
+                saved = []
+                for article in articles:
+                    if database_service.save_article(article):
+                        saved.append(article)
+                        results.append((True, "Article saved; indexing for search in the background"))
+                    else:
+                        results.append((False, self._save_error(article)))
+                if saved:
+                    self._index_executor.submit(self._index_in_background, saved)
+                return results
+            
+            chunk_lists = self._build_chunks_many(articles)
             
             # Save to databases
             print("Saving to databases...")
-            
-            # Save article metadata to SQLite
-            if not database_service.save_article(article):
-                return False, "Error saving article metadata"
-            
-            # Save chunks to Pinecone
-            if not database_service.save_chunks_to_pinecone(article_chunks):
-                return False, "Error saving article chunks"
-            
-            print("Article saved successfully!")
-            return True, f"Article processed and saved: {len(article_chunks)} chunks created"
+            return [
+                self._store_article(article, article_chunks)
+                for article, article_chunks in zip(articles, chunk_lists)
+            ]
             
         except Exception as e:
             print(f"Error processing article: {e}")
-            return False, f"Error processing article: {str(e)}"
+            return [(False, f"Error processing article: {str(e)}")] * len(articles)
     
-    def ingest_article(self, url: str) -> Tuple[bool, str, Optional[Article]]:
-        success, message, article = self.fetch_article(url)
-        if not success:
-            return False, message, None
+    def _store_article(self, article: Article, article_chunks: List[ArticleChunk]) -> Tuple[bool, str]:
+        # Save article metadata to SQLite
+        if not database_service.save_article(article):
+            return False, self._save_error(article)
         
-        success, process_message = self.process_and_store_article(article)
-        if not success:
-            return False, process_message, None
+        # Save chunks to the vector store
+        if not database_service.save_chunks(article_chunks):
+            return False, "Error saving article chunks"
         
-        return True, f"Successfully added article: {article.title}", article
+        print("Article saved successfully!")
+        return True, f"Article processed and saved: {len(article_chunks)} chunks created"
+    
+    @staticmethod
+    def _save_error(article: Article) -> str:
+        # save_article refuses an article whose URL another ingest saved first
+        if database_service.article_exists(article.url):
+            return "Article already exists in your library"
+        return "Error saving article metadata"
+    
+    def _index_in_background(self, articles: List[Article]):
+        try:
+            chunk_lists = self._build_chunks_many(articles)
+        except Exception as e:
+            print(f"Error indexing article in background: {e}")
+            chunk_lists = [None] * len(articles)
+        
+        for article, article_chunks in zip(articles, chunk_lists):
+            if article_chunks is not None and database_service.save_chunks(article_chunks):
+                print(f"Article indexed: {article.title}")
+                continue
+            print(f"Error indexing article in background: {article.title}")
+            # Leave nothing half-ingested so the URL can simply be added again
+            database_service.delete_article(article.id)
+    
+    def ingest_article(self, url: str, background: bool = False) -> Tuple[bool, str, Optional[Article]]:
+        return self.ingest_articles([url], background=background)[0]
+    
+    def ingest_articles(self, urls: List[str], background: bool = False) -> List[Tuple[bool, str, Optional[Article]]]:
+        """
+        Ingest several URLs, fetching up to INGEST_CONCURRENCY at a time.
+        
+        The chunks of every fetched article are embedded together, so a
+        batch of short articles shares embedding requests. Returns one
+        (success, message, article) tuple per URL, in input order.
+        """
+        results = [None] * len(urls)
+        pending = {}
+        for i, url in enumerate(urls):
+            key = normalize_url(url)
+            if key in pending:
+                results[i] = (False, "Duplicate URL in this batch", None)
+            else:
+                pending[key] = i
+        
+        with ThreadPoolExecutor(max_workers=config.INGEST_CONCURRENCY, thread_name_prefix="fetch") as executor:
+            fetched = list(executor.map(
+                lambda i: self.fetch_article(urls[i], summarize=False), pending.values()
+            ))
+        
+        articles, positions = [], []
+        for i, (success, message, article) in zip(pending.values(), fetched):
+            if success:
+                articles.append(article)
+                positions.append(i)
+            else:
+                results[i] = (False, message, None)
+        
+        if articles:
+            print("Generating summary..." if len(articles) == 1 else f"Generating {len(articles)} summaries...")
+            for article, summary in zip(articles, self._generate_summaries([article.content for article in articles])):
+                article.summary = summary
+            
+            processed = self.process_and_store_articles(articles, background=background)
+            for i, article, (success, process_message) in zip(positions, articles, processed):
+                if not success:
+                    results[i] = (False, process_message, None)
+                elif background:
+                    results[i] = (True, f"Successfully added article: {article.title} (indexing for search in the background)", article)
+                else:
+                    results[i] = (True, f"Successfully added article: {article.title}", article)
+        
+        return results
+    
+    def _close_browser(self, worker: _BrowserWorker):
+        if worker.context:
+            worker.context.close()
+        if worker.browser:
+            worker.browser.close()
+        if worker.playwright:
+            worker.playwright.stop()
     
     def __del__(self):
         try:
-            if self.browser:
-                self.browser.close()
-            if self.playwright:
-                self.playwright.stop()
+            for worker in self._browser_workers:
+                worker.executor.submit(self._close_browser, worker).result(timeout=10)
+                worker.executor.shutdown(wait=False)
+            self._index_executor.shutdown(wait=False)
         except:
             pass 
 
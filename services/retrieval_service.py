@@ -1,14 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Tuple
+import numpy as np
 from anthropic import Anthropic
 
 from models import QueryResponse, SearchResult
 from services.embedding_service import embedding_service
 from services.database_service import database_service
+from utils.cache import SemanticCache
 from utils.config import config
+from utils.llm_cache import cached_completion
+
+ANSWER_ERROR_PREFIX = "I'm sorry, but I encountered an error generating an answer"
+
+# Reciprocal rank fusion constant; damps the weight of the top few ranks
+RRF_K = 60
+
+# Maximal marginal relevance: weight of a chunk's retrieval score against its
+# similarity to chunks already chosen for the answer context, and the
+# similarity above which a chunk is dropped as a near-duplicate
+MMR_LAMBDA = 0.7
+MMR_DUPLICATE_SIMILARITY = 0.95
+
+# The vector search (query embedding + index lookup) runs here while the
+# keyword search runs on the calling thread
+_search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search")
+
+def _normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share cached embeddings."""
+    return " ".join(query.lower().split())
+
+def _reciprocal_rank_fusion(result_lists: List[List[SearchResult]], top_k: int) -> List[SearchResult]:
+    """
+    Merge ranked result lists by summing 1 / (RRF_K + rank) per chunk.
+
+    The fused score is scaled so a chunk ranked first in every list scores 1.0.
+    """
+    fused_scores = {}
+    results_by_chunk = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            fused_scores[result.chunk_id] = fused_scores.get(result.chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+            results_by_chunk.setdefault(result.chunk_id, result)
+
+    best_score = len(result_lists) / (RRF_K + 1)
+    ranked = sorted(fused_scores, key=fused_scores.get, reverse=True)[:top_k]
+    return [
+        results_by_chunk[chunk_id].model_copy(update={"score": fused_scores[chunk_id] / best_score})
+        for chunk_id in ranked
+    ]
+
+def _mmr_select(scores: np.ndarray, vectors: np.ndarray, k: int) -> List[int]:
+    """
+    Indices of up to k results in maximal-marginal-relevance order.
+
+    `vectors` holds one row per result; all-zero rows (no stored vector)
+    never count as redundant.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    similarity = unit @ unit.T
+
+    available = np.ones(len(scores), dtype=bool)
+    redundancy = np.zeros(len(scores), dtype=np.float32)
+    selected = []
+    while len(selected) < k and available.any():
+        marginal = np.where(available, MMR_LAMBDA * scores - (1 - MMR_LAMBDA) * redundancy, -np.inf)
+        best = int(np.argmax(marginal))
+        available[best] = False
+        if selected and redundancy[best] >= MMR_DUPLICATE_SIMILARITY:
+            continue
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
 
 class RetrievalService:
     def __init__(self):
         self.client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
+        self.answer_cache = SemanticCache(
+            "answer_cache",
+            threshold=config.ANSWER_CACHE_THRESHOLD,
+            ttl_seconds=config.ANSWER_CACHE_TTL_DAYS * 86400,
+            max_entries=config.ANSWER_CACHE_MAX_ENTRIES
+        )
     
     def search_articles(
             self,
@@ -18,13 +91,14 @@ class RetrievalService:
     ) -> List[SearchResult]:
         try:
             print(f" Searching for: {query}")
-            query_embedding = embedding_service.generate_embedding(query)
+            top_k = top_k or config.TOP_K_RESULTS
 
-            results = database_service.query_pinecone(
-                query_embedding=query_embedding,
-                top_k=top_k or config.TOP_K_RESULTS,
-                filter_dict=filters
-            )
+            vector_future = _search_executor.submit(self._vector_search, query, top_k, filters)
+            if config.HYBRID_SEARCH:
+                keyword_results = database_service.keyword_search(query, top_k, filters)
+                results = _reciprocal_rank_fusion([vector_future.result(), keyword_results], top_k)
+            else:
+                results = vector_future.result()
 
             print(f"Found {len(results)} relevant chunks")
             return results
@@ -33,6 +107,36 @@ class RetrievalService:
             print(f"Error searching articles: {e}")
             return []
     
+    def _embed_query(self, query: str):
+        return embedding_service.generate_embedding(_normalize_query(query))
+    
+    def _vector_search(self, query: str, top_k: int, filters: dict = None) -> List[SearchResult]:
+        query_embedding = self._embed_query(query)
+        if query_embedding is None:
+            return []
+
+        return database_service.query_chunks(
+            query_embedding=query_embedding,
+            top_k=top_k,
+            filter_dict=filters
+        )
+    
+    def _diverse_results(self, results: List[SearchResult]) -> List[SearchResult]:
+        """Reorder results by MMR and drop near-duplicate chunks ahead of prompting."""
+        if len(results) < 2:
+            return results
+
+        embeddings = database_service.chunk_embeddings([r.chunk_id for r in results if r.chunk_id])
+        if not embeddings:
+            return results
+
+        dimension = len(next(iter(embeddings.values())))
+        vectors = np.stack([
+            embeddings.get(r.chunk_id, np.zeros(dimension, dtype=np.float32)) for r in results
+        ]).astype(np.float32)
+        scores = np.array([r.score for r in results], dtype=np.float32)
+        return [results[i] for i in _mmr_select(scores, vectors, len(results))]
+    
     def generate_answer(
             self,
             question: str,
@@ -57,25 +161,37 @@ class RetrievalService:
             Question: {question}
             Answer:"""
 
-            message = self.client.messages.create(
-                model=config.LLM_MODEL,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            answer = message.content[0].text.strip()
+            answer = cached_completion(self.client, config.LLM_MODEL, prompt, max_tokens=max_tokens)
             return answer
         
         except Exception as e:
             print(f"Error generating answer: {e}")
-            return f"I'm sorry, but I encountered an error generating an answer: {str(e)}"
+            return f"{ANSWER_ERROR_PREFIX}: {str(e)}"
         
     def answer_question(
             self,
             question: str,
             top_k: int=None,
+            namespace: str="default",
     ) -> QueryResponse:
         try:
+            # Near-duplicate questions reuse a cached answer. The namespace
+            # includes the library state so adding or deleting articles
+            # never serves answers built from the old library.
+            top_k = top_k or config.TOP_K_RESULTS
+            cache_namespace = f"{namespace}:{top_k}:{database_service.library_version()}"
+            query_embedding = self._embed_query(question)
+            if query_embedding is not None:
+                cached = self.answer_cache.lookup(query_embedding, cache_namespace)
+                if cached:
+                    cached_response = QueryResponse.model_validate_json(cached)
+                    print("Answer served from cache")
+                    return QueryResponse(
+                        answer=cached_response.answer,
+                        sources=cached_response.sources,
+                        query=question
+                    )
+
             results = self.search_articles(question, top_k=top_k)
 
             if not results:
@@ -85,14 +201,20 @@ class RetrievalService:
                     query=question
                 )
             
+            results = self._diverse_results(results)
+            
             print("Generating answer...")
             answer = self.generate_answer(question, results)
 
-            return QueryResponse(
+            response = QueryResponse(
                 answer=answer,
                 sources=results,
                 query=question
             )
+            if query_embedding is not None and not answer.startswith(ANSWER_ERROR_PREFIX):
+                self.answer_cache.store(query_embedding, response.model_dump_json(), cache_namespace)
+
+            return response
         
         except Exception as e:
             print(f"Error answer question: {e}")
@@ -112,9 +234,20 @@ class RetrievalService:
             if not article:
                 return []
             
-            query = f"{article.title} {article.summary or ''}"
-
-            results = self.search_articles(query, top_k=top_k * 2)
+            # Search by the article's stored vectors; only articles that are
+            # not indexed yet fall back to embedding their title and summary
+            embedding = database_service.article_embedding(article_id)
+            if embedding is not None:
+                # The article's own chunks are its nearest neighbours, so the
+                # local backends, which filter after the search, fetch past them
+                results = database_service.query_chunks(
+                    embedding,
+                    top_k=top_k * 2 + database_service.count_chunks(article_id),
+                    filter_dict={"article_id": {"$ne": article_id}}
+                )
+            else:
+                query = f"{article.title} {article.summary or ''}"
+                results = self.search_articles(query, top_k=top_k * 2)
 
             related = [r for r in results if r.article_id != article_id]
 
@@ -172,13 +305,7 @@ class RetrievalService:
             Articles: {context}
             Synthesis:"""
             
-            message = self.client.messages.create(
-                model=config.LLM_MODEL,
-                max_tokens=1500,
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            synthesis = message.content[0].text.strip()
+            synthesis = cached_completion(self.client, config.LLM_MODEL, prompt, max_tokens=1500)
             return synthesis
         
         except Exception as e:
@@ -0,0 +1,628 @@
+"""
+Vector store backends for chunk embeddings, selected by config.VECTOR_BACKEND.
+
+Every method takes the SQLite connection the caller checked out of the
+DatabaseService pool, so vector writes share the caller's transaction.
+Callers end a transaction that wrote vectors with the store's commit() or
+rollback(), which lets the FAISS store defer index changes until commit.
+"""
+import math
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from models import ArticleChunk, SearchResult
+from utils.config import config
+
+# Pinecone rejects large upsert payloads; batches are sent concurrently
+# over the client's thread pool
+PINECONE_UPSERT_BATCH_SIZE = 100
+PINECONE_POOL_THREADS = 8
+
+# Fetch ids travel in the request URL, and Pinecone caps a fetch at 1000
+PINECONE_FETCH_BATCH_SIZE = 200
+
+# Vector values travel to Pinecone as JSON decimals. Rounding unit-vector
+# components to this many places shortens each from ~20 characters to ~8
+# while moving dot products by around 1e-6.
+PINECONE_VALUE_DECIMALS = 5
+
+# HNSW graph parameters for the local FAISS index
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# HNSW graphs cannot remove vectors, so deleted ids are excluded at search
+# time; the graph is rebuilt once they pass this fraction of the index
+HNSW_REBUILD_DELETED_FRACTION = 0.2
+
+# Past this many vectors the FAISS index is rebuilt as IVF-PQ, which stores
+# each vector as dimension/8 one-byte codes and only scans IVF_NPROBE lists
+IVFPQ_THRESHOLD = 10_000
+IVF_NPROBE = 16
+PQ_NBITS = 8
+
+# With VECTOR_PRECISION=int8 the HNSW index stores 8-bit scalar-quantized
+# vectors. The per-dimension range is learned from the first batch saved and
+# widened by this fraction so later vectors are rarely clipped.
+SQ_RANGE_MARGIN = 0.2
+
+
+def _quantize_int8(vector: np.ndarray) -> bytes:
+    """Scale a vector so its largest component maps to +/-127 and round to int8."""
+    vector = np.asarray(vector, dtype=np.float32)
+    scale = max(float(np.abs(vector).max()), 1e-12) / 127
+    return np.round(vector / scale).astype(np.int8).tobytes()
+
+
+def _matches_filter(metadata: Dict[str, Any], filter_dict: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Pinecone's metadata filter syntax used by the app."""
+    if not filter_dict:
+        return True
+
+    for key, condition in filter_dict.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _build_results(hits, rows, top_k: int, filter_dict: Optional[Dict[str, Any]]) -> List[SearchResult]:
+    """Turn (key, score) hits plus their joined chunk/article rows into SearchResults."""
+    search_results = []
+    for key, score in hits:
+        row = rows.get(key)
+        if row is None:
+            continue
+
+        metadata = {
+            "article_id": row['article_id'],
+            "chunk_index": row['chunk_index'],
+            "text": row['text'],
+            "article_title": row['title'],
+            "article_url": row['url'],
+            "article_author": row['author'] or "",
+            "article_date": row['publish_date'] or "",
+        }
+        if not _matches_filter(metadata, filter_dict):
+            continue
+
+        search_results.append(SearchResult(
+            chunk_id=row['chunk_id'],
+            article_id=row['article_id'],
+            article_title=row['title'],
+            article_url=row['url'],
+            chunk_text=row['text'],
+            score=score,
+            metadata=metadata
+        ))
+        if len(search_results) >= top_k:
+            break
+
+    return search_results
+
+
+class PineconeVectorStore:
+    """
+    Pinecone serverless index.
+
+    Only article_id, chunk_index and the chunk text are stored as vector
+    metadata; article fields are joined from the SQLite `articles` table at
+    query time so they are not repeated on every chunk.
+    """
+
+    @staticmethod
+    def prepare_connection(conn: sqlite3.Connection):
+        pass
+
+    def __init__(self, dimension: int, conn: sqlite3.Connection):
+        from pinecone import Pinecone, ServerlessSpec
+
+        self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
+
+        # Check if index exists, create if not
+        index_name = config.PINECONE_INDEX_NAME
+        existing_indexes = [idx.name for idx in self.pc.list_indexes()]
+
+        if index_name not in existing_indexes:
+            print(f"Creating Pinecone index: {index_name}")
+
+            self.pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                # Embeddings are unit length, so dot product ranks like cosine
+                metric="dotproduct",
+                spec=ServerlessSpec(
+                    cloud="aws",
+                    region="us-east-1"
+                )
+            )
+            print("Index created successfully")
+
+        self.index = self.pc.Index(index_name, pool_threads=PINECONE_POOL_THREADS)
+        print(f"Connected to Pinecone index: {index_name}")
+
+    def save_chunks(self, conn: sqlite3.Connection, chunks: List[ArticleChunk]):
+        vectors = []
+        for chunk in chunks:
+            metadata = {
+                "article_id": chunk.article_id,
+                "chunk_index": chunk.chunk_index,
+                "text": chunk.text,
+            }
+
+            vectors.append({
+                "id": chunk.id,
+                "values": np.round(chunk.embedding.astype(np.float64), PINECONE_VALUE_DECIMALS).tolist(),
+                "metadata": metadata
+            })
+
+        futures = [
+            self.index.upsert(vectors=vectors[start:start + PINECONE_UPSERT_BATCH_SIZE], async_req=True)
+            for start in range(0, len(vectors), PINECONE_UPSERT_BATCH_SIZE)
+        ]
+        for future in futures:
+            future.get()
+
+    def query(
+        self,
+        conn: sqlite3.Connection,
+        query_embedding: np.ndarray,
+        top_k: int,
+        filter_dict: Dict[str, Any] = None
+    ) -> List[SearchResult]:
+        results = self.index.query(
+            vector=np.asarray(query_embedding, dtype=np.float32).tolist(),
+            top_k=top_k,
+            include_metadata=True,
+            filter=filter_dict
+        )
+
+        article_ids = list({match.metadata.get("article_id", "") for match in results.matches})
+        if not article_ids:
+            return []
+
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(article_ids))
+        cursor.execute(
+            f"SELECT id, title, url, author, publish_date FROM articles WHERE id IN ({placeholders})",
+            article_ids
+        )
+        articles = {row['id']: row for row in cursor.fetchall()}
+
+        hits, rows = [], {}
+        for match in results.matches:
+            article = articles.get(match.metadata.get("article_id", ""))
+            if article is None:
+                continue
+            hits.append((match.id, match.score))
+            rows[match.id] = {
+                "chunk_id": match.id,
+                "article_id": article['id'],
+                "chunk_index": int(match.metadata.get("chunk_index", 0)),
+                "text": match.metadata.get("text", ""),
+                "title": article['title'],
+                "url": article['url'],
+                "author": article['author'],
+                "publish_date": article['publish_date'],
+            }
+
+        # Pinecone already applied filter_dict server-side
+        return _build_results(hits, rows, top_k, None)
+
+    def fetch_embeddings(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of whichever of `chunk_ids` are in the index."""
+        embeddings = {}
+        for start in range(0, len(chunk_ids), PINECONE_FETCH_BATCH_SIZE):
+            response = self.index.fetch(ids=chunk_ids[start:start + PINECONE_FETCH_BATCH_SIZE])
+            embeddings.update(
+                (chunk_id, np.asarray(vector.values, dtype=np.float32))
+                for chunk_id, vector in response.vectors.items()
+            )
+        return embeddings
+
+    def delete(self, conn: sqlite3.Connection, chunk_ids: List[str]):
+        self.index.delete(ids=chunk_ids)
+
+    def commit(self, conn: sqlite3.Connection):
+        conn.commit()
+
+    def rollback(self, conn: sqlite3.Connection):
+        conn.rollback()
+
+
+class FaissVectorStore:
+    """
+    In-process FAISS index for single-user deployments.
+
+    Vectors are L2-normalized on insert so inner product equals cosine
+    similarity. FAISS only accepts integer ids, so string chunk ids are
+    mapped through the `idmap` table in the SQLite database; chunk text and
+    article metadata are joined back from the `chunks` and `articles` tables.
+
+    Small libraries use an HNSW graph, over int8 scalar-quantized vectors
+    when VECTOR_PRECISION is "int8". Once the index reaches IVFPQ_THRESHOLD
+    vectors it is retrained and rebuilt as IVF-PQ.
+    """
+
+    @staticmethod
+    def prepare_connection(conn: sqlite3.Connection):
+        pass
+
+    def __init__(self, dimension: int, conn: sqlite3.Connection):
+        import faiss
+
+        self.faiss = faiss
+        self.dimension = dimension
+        self.index_path = config.DATA_DIR / "index.faiss"
+        self._lock = threading.Lock()
+
+        self._create_tables(conn)
+        self.index = self._load_index()
+        self._deleted = self._load_deleted(conn)
+        # Index changes of each connection's open transaction, applied on commit
+        self._pending: Dict[sqlite3.Connection, List[Tuple[np.ndarray, Optional[np.ndarray]]]] = {}
+        print(f"Loaded FAISS index: {self.index_path} ({self.index.ntotal} vectors)")
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS idmap (
+                int_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chunk_id TEXT UNIQUE NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _load_index(self):
+        if self.index_path.exists():
+            index = self.faiss.read_index(str(self.index_path))
+        else:
+            index = self._new_hnsw_index()
+
+        self._configure_search(index)
+        return index
+
+    def _load_deleted(self, conn: sqlite3.Connection) -> set:
+        """Ids still in the HNSW graph whose chunks have been deleted."""
+        if self._is_ivf():
+            return set()
+        cursor = conn.cursor()
+        cursor.execute("SELECT int_id FROM idmap")
+        mapped = {row['int_id'] for row in cursor.fetchall()}
+        return set(self.faiss.vector_to_array(self.index.id_map).tolist()) - mapped
+
+    def _new_hnsw_index(self):
+        if config.VECTOR_PRECISION == "int8":
+            hnsw = self.faiss.IndexHNSWSQ(
+                self.dimension, self.faiss.ScalarQuantizer.QT_8bit, HNSW_M,
+                self.faiss.METRIC_INNER_PRODUCT
+            )
+            self.faiss.downcast_index(hnsw.storage).sq.rangestat_arg = SQ_RANGE_MARGIN
+        else:
+            hnsw = self.faiss.IndexHNSWFlat(self.dimension, HNSW_M, self.faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return self.faiss.IndexIDMap2(hnsw)
+
+    def _configure_search(self, index):
+        ivf = self.faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = IVF_NPROBE
+            # Lets fetch_embeddings reconstruct vectors by id
+            ivf.set_direct_map_type(self.faiss.DirectMap.Hashtable)
+        else:
+            self.faiss.downcast_index(index.index).hnsw.efSearch = HNSW_EF_SEARCH
+
+    def _is_ivf(self) -> bool:
+        return self.faiss.try_extract_index_ivf(self.index) is not None
+
+    def _live_ids(self) -> np.ndarray:
+        """Ids in the HNSW graph whose chunks have not been deleted."""
+        ids = self.faiss.vector_to_array(self.index.id_map)
+        if self._deleted:
+            ids = ids[~np.isin(ids, np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted)))]
+        return ids
+
+    def _rebuild_ivfpq(self):
+        """Retrain the index as IVF-PQ from every live vector."""
+        ids = self._live_ids()
+        vectors = self.index.reconstruct_batch(ids)
+
+        nlist = int(4 * math.sqrt(len(ids)))
+        quantizer = self.faiss.IndexFlatIP(self.dimension)
+        index = self.faiss.IndexIVFPQ(
+            quantizer, self.dimension, nlist, self.dimension // 8, PQ_NBITS,
+            self.faiss.METRIC_INNER_PRODUCT
+        )
+        print(f"Rebuilding FAISS index as IVF-PQ ({len(ids)} vectors, nlist={nlist})")
+        index.train(vectors)
+        index.add_with_ids(vectors, ids)
+
+        self._configure_search(index)
+        self.index = index
+        self._deleted = set()
+
+    def _rebuild_hnsw(self):
+        """
+        Rebuild the HNSW graph from every live vector.
+
+        Drops the vectors of deleted chunks, which HNSW graphs cannot
+        remove in place.
+        """
+        ids = self._live_ids()
+
+        index = self._new_hnsw_index()
+        if len(ids):
+            vectors = self.index.reconstruct_batch(ids)
+            index.train(vectors)
+            index.add_with_ids(vectors, ids)
+
+        self._configure_search(index)
+        self.index = index
+        self._deleted = set()
+
+    def _normalized(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        self.faiss.normalize_L2(vectors)
+        return vectors
+
+    def commit(self, conn: sqlite3.Connection):
+        """
+        Commit the caller's transaction, then apply its index changes.
+
+        The index is only touched once the idmap rows it depends on are
+        committed, so a rolled-back transaction leaves no vectors behind
+        under ids that AUTOINCREMENT will hand out again.
+        """
+        conn.commit()
+        changes = self._pending.pop(conn, [])
+        if not changes:
+            return
+
+        with self._lock:
+            changed = False
+            for ids, vectors in changes:
+                if vectors is not None:
+                    self._add(ids, vectors)
+                    changed = True
+                else:
+                    changed = self._remove(ids) or changed
+            if changed:
+                self.faiss.write_index(self.index, str(self.index_path))
+
+    def rollback(self, conn: sqlite3.Connection):
+        conn.rollback()
+        self._pending.pop(conn, None)
+
+    def _add(self, ids: np.ndarray, vectors: np.ndarray):
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        self.index.add_with_ids(vectors, ids)
+        if not self._is_ivf() and self.index.ntotal >= IVFPQ_THRESHOLD:
+            self._rebuild_ivfpq()
+
+    def _remove(self, ids: np.ndarray) -> bool:
+        """Drop ids from search; True if the index itself changed."""
+        if self._is_ivf():
+            self.index.remove_ids(ids)
+            return True
+        self._deleted.update(ids.tolist())
+        if len(self._deleted) <= HNSW_REBUILD_DELETED_FRACTION * self.index.ntotal:
+            return False
+        self._rebuild_hnsw()
+        return True
+
+    def save_chunks(self, conn: sqlite3.Connection, chunks: List[ArticleChunk]):
+        chunk_ids = [chunk.id for chunk in chunks]
+        vectors = self._normalized(np.stack([chunk.embedding for chunk in chunks]))
+
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO idmap (chunk_id) VALUES (?)",
+            [(chunk_id,) for chunk_id in chunk_ids]
+        )
+        placeholders = ",".join("?" * len(chunk_ids))
+        cursor.execute(
+            f"SELECT int_id, chunk_id FROM idmap WHERE chunk_id IN ({placeholders})",
+            chunk_ids
+        )
+        int_ids = {row['chunk_id']: row['int_id'] for row in cursor.fetchall()}
+        ids = np.array([int_ids[chunk_id] for chunk_id in chunk_ids], dtype=np.int64)
+
+        # Added to the index by commit()
+        self._pending.setdefault(conn, []).append((ids, vectors))
+
+    def query(
+        self,
+        conn: sqlite3.Connection,
+        query_embedding: np.ndarray,
+        top_k: int,
+        filter_dict: Dict[str, Any] = None
+    ) -> List[SearchResult]:
+        query = self._normalized(query_embedding)
+
+        # Over-fetch so filtered-out chunks still leave top_k hits
+        with self._lock:
+            params = None
+            if self._deleted:
+                deleted = np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+                params = self.faiss.SearchParameters(
+                    sel=self.faiss.IDSelectorNot(self.faiss.IDSelectorBatch(deleted))
+                )
+            scores, ids = self.index.search(query, top_k * 2, params=params)
+
+        hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1]
+        if not hits:
+            return []
+
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(hits))
+        cursor.execute(f"""
+            SELECT m.int_id, m.chunk_id, c.article_id, c.chunk_index, c.text,
+                   a.title, a.url, a.author, a.publish_date
+            FROM idmap m
+            JOIN chunks c ON c.id = m.chunk_id
+            JOIN articles a ON a.id = c.article_id
+            WHERE m.int_id IN ({placeholders})
+        """, [int_id for int_id, _ in hits])
+        rows = {row['int_id']: row for row in cursor.fetchall()}
+
+        return _build_results(hits, rows, top_k, filter_dict)
+
+    def fetch_embeddings(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of whichever of `chunk_ids` are in the index."""
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(chunk_ids))
+        cursor.execute(
+            f"SELECT int_id, chunk_id FROM idmap WHERE chunk_id IN ({placeholders})",
+            chunk_ids
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return {}
+
+        ids = np.array([row['int_id'] for row in rows], dtype=np.int64)
+        with self._lock:
+            vectors = self.index.reconstruct_batch(ids)
+        return {row['chunk_id']: vector for row, vector in zip(rows, vectors)}
+
+    def delete(self, conn: sqlite3.Connection, chunk_ids: List[str]):
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(chunk_ids))
+        cursor.execute(
+            f"SELECT int_id FROM idmap WHERE chunk_id IN ({placeholders})",
+            chunk_ids
+        )
+        ids = np.array([row['int_id'] for row in cursor.fetchall()], dtype=np.int64)
+        if not len(ids):
+            return
+        cursor.execute(f"DELETE FROM idmap WHERE chunk_id IN ({placeholders})", chunk_ids)
+
+        # Removed from the index by commit()
+        self._pending.setdefault(conn, []).append((ids, None))
+
+
+class SqliteVecVectorStore:
+    """
+    Vectors stored in the application's SQLite database through sqlite-vec.
+
+    Embeddings live in a `chunk_vec` vec0 virtual table keyed by chunk id,
+    so they are written and deleted in the same transaction as the `chunks`
+    rows and no separate store has to be kept in sync.
+
+    With VECTOR_PRECISION "int8" each vector is scaled by its own largest
+    component and stored as int8. Cosine distance ignores that scale, so no
+    per-vector factor has to be kept.
+    """
+
+    @staticmethod
+    def prepare_connection(conn: sqlite3.Connection):
+        """Load the sqlite-vec extension; needed on every connection that touches chunk_vec."""
+        import sqlite_vec
+
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+
+    def __init__(self, dimension: int, conn: sqlite3.Connection):
+        self.dimension = dimension
+        self.int8 = config.VECTOR_PRECISION == "int8"
+
+        self._create_tables(conn)
+        print("Loaded sqlite-vec vector table: chunk_vec")
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunk_vec USING vec0(
+                chunk_id TEXT PRIMARY KEY,
+                embedding {"int8" if self.int8 else "float"}[{self.dimension}] distance_metric=cosine
+            )
+        """)
+        conn.commit()
+
+    @property
+    def _vector_sql(self) -> str:
+        return "vec_int8(?)" if self.int8 else "?"
+
+    def _encode(self, vector: np.ndarray) -> bytes:
+        if self.int8:
+            return _quantize_int8(vector)
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+    def save_chunks(self, conn: sqlite3.Connection, chunks: List[ArticleChunk]):
+        cursor = conn.cursor()
+        cursor.executemany(
+            f"INSERT INTO chunk_vec (chunk_id, embedding) VALUES (?, {self._vector_sql})",
+            [(chunk.id, self._encode(chunk.embedding)) for chunk in chunks]
+        )
+
+    def query(
+        self,
+        conn: sqlite3.Connection,
+        query_embedding: np.ndarray,
+        top_k: int,
+        filter_dict: Dict[str, Any] = None
+    ) -> List[SearchResult]:
+        query = self._encode(query_embedding)
+
+        # Over-fetch so filtered-out chunks still leave top_k hits
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            WITH knn AS (
+                SELECT chunk_id, distance
+                FROM chunk_vec
+                WHERE embedding MATCH {self._vector_sql} AND k = ?
+            )
+            SELECT knn.chunk_id, knn.distance, c.article_id, c.chunk_index, c.text,
+                   a.title, a.url, a.author, a.publish_date
+            FROM knn
+            JOIN chunks c ON c.id = knn.chunk_id
+            JOIN articles a ON a.id = c.article_id
+            ORDER BY knn.distance
+        """, (query, top_k * 2))
+        rows = {row['chunk_id']: row for row in cursor.fetchall()}
+
+        # vec0 reports cosine distance; convert back to similarity like Pinecone
+        hits = [(chunk_id, 1.0 - row['distance']) for chunk_id, row in rows.items()]
+        return _build_results(hits, rows, top_k, filter_dict)
+
+    def fetch_embeddings(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Stored vectors of whichever of `chunk_ids` are in the table.
+
+        int8 vectors come back in their quantized scale, which only matters
+        to callers that compare magnitudes rather than directions.
+        """
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(chunk_ids))
+        cursor.execute(
+            f"SELECT chunk_id, embedding FROM chunk_vec WHERE chunk_id IN ({placeholders})",
+            chunk_ids
+        )
+        dtype = np.int8 if self.int8 else np.float32
+        return {
+            row['chunk_id']: np.frombuffer(row['embedding'], dtype=dtype).astype(np.float32)
+            for row in cursor.fetchall()
+        }
+
+    def delete(self, conn: sqlite3.Connection, chunk_ids: List[str]):
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(chunk_ids))
+        cursor.execute(f"DELETE FROM chunk_vec WHERE chunk_id IN ({placeholders})", chunk_ids)
+
+    def commit(self, conn: sqlite3.Connection):
+        conn.commit()
+
+    def rollback(self, conn: sqlite3.Connection):
+        conn.rollback()
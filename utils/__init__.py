@@ -1,8 +1,10 @@
 from .config import config
-from .text_processing import chunk_text, clean_text, count_tokens, extract_keywords
+from .text_processing import chunk_text, chunk_texts, clean_text, count_tokens, extract_keywords, iter_chunks
 
 __all__ = ['config',
            'chunk_text',
+           'chunk_texts',
            'clean_text',
            'count_tokens',
-           'extract_keywords']
\ No newline at end of file
+           'extract_keywords',
+           'iter_chunks']
\ No newline at end of file
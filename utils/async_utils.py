@@ -0,0 +1,28 @@
+"""Helpers for driving async clients from the synchronous services."""
+import asyncio
+import threading
+from typing import Coroutine
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    The event loop every run_sync call runs on, started on first use.
+
+    Async clients keep their connection pools bound to the loop that opened
+    them, so a single long-lived loop is what lets the services hold one
+    client each instead of opening a new one per call.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-clients", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro: Coroutine):
+    """Run a coroutine to completion from synchronous code."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
@@ -0,0 +1,195 @@
+"""SQLite-backed caches for embeddings and generated answers."""
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from utils.config import config
+
+MAX_NAMESPACES_IN_MEMORY = 8
+
+# Keys per statement in get_many; stays well under SQLite's variable limit
+MAX_KEYS_PER_QUERY = 500
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(str(config.DATA_DIR / "cache.db"), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class KeyValueCache:
+    """Persistent key/value store kept in its own table of data/cache.db."""
+
+    def __init__(self, table: str, ttl_seconds: Optional[float] = None):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.conn = _connect()
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self.conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        if self.ttl_seconds is not None and time.time() - row['created_at'] > self.ttl_seconds:
+            return None
+        return row['value']
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Return the live values for whichever of `keys` are cached."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), MAX_KEYS_PER_QUERY):
+                batch = keys[start:start + MAX_KEYS_PER_QUERY]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, value, created_at FROM {self.table} WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                found.update((row['key'], row) for row in rows)
+
+        now = time.time()
+        return {
+            key: row['value'] for key, row in found.items()
+            if self.ttl_seconds is None or now - row['created_at'] <= self.ttl_seconds
+        }
+
+    def set(self, key: str, value: bytes):
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, bytes]]):
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items]
+            )
+            self.conn.commit()
+
+
+class SemanticCache:
+    """
+    Payloads keyed by embedding, returned for near-duplicate lookups.
+
+    A lookup hits when the cosine similarity between the query embedding and
+    a stored embedding in the same namespace is at least `threshold`. The
+    embeddings of live entries are held in memory per namespace so a lookup
+    is a single matrix-vector product; payloads are only read on a hit.
+    """
+
+    def __init__(self, table: str, threshold: float, ttl_seconds: float, max_entries: int):
+        self.table = table
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.conn = _connect()
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+        with self._lock:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table}_namespace ON {self.table}(namespace, id)"
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _load(self, namespace: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (ids, created_at, unit embeddings) for a namespace, newest first."""
+        if namespace not in self._entries:
+            # Namespaces roll over as the library changes; keep only recent ones in memory
+            while len(self._entries) >= MAX_NAMESPACES_IN_MEMORY:
+                self._entries.pop(next(iter(self._entries)))
+
+            rows = self.conn.execute(f"""
+                SELECT id, embedding, created_at FROM {self.table}
+                WHERE namespace = ? AND created_at >= ?
+                ORDER BY id DESC LIMIT ?
+            """, (namespace, time.time() - self.ttl_seconds, self.max_entries)).fetchall()
+
+            ids = np.array([row['id'] for row in rows], dtype=np.int64)
+            created = np.array([row['created_at'] for row in rows], dtype=np.float64)
+            if rows:
+                matrix = np.stack([np.frombuffer(row['embedding'], dtype=np.float32) for row in rows])
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            self._entries[namespace] = (ids, created, matrix)
+        return self._entries[namespace]
+
+    def lookup(self, embedding: np.ndarray, namespace: str = "default") -> Optional[str]:
+        query = self._unit(embedding)
+
+        with self._lock:
+            ids, created, matrix = self._load(namespace)
+            if not len(ids):
+                return None
+
+            scores = matrix @ query
+            scores[created < time.time() - self.ttl_seconds] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            row = self.conn.execute(
+                f"SELECT payload FROM {self.table} WHERE id = ?", (int(ids[best]),)
+            ).fetchone()
+        return row['payload'] if row else None
+
+    def store(self, embedding: np.ndarray, payload: str, namespace: str = "default"):
+        vector = self._unit(embedding)
+        now = time.time()
+
+        with self._lock:
+            ids, created, matrix = self._load(namespace)
+
+            cursor = self.conn.execute(
+                f"INSERT INTO {self.table} (namespace, embedding, payload, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, vector.tobytes(), payload, now)
+            )
+            # Drop expired entries in any namespace, which lookups already
+            # ignore, and anything in this namespace beyond its newest max_entries
+            self.conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.conn.execute(f"""
+                DELETE FROM {self.table}
+                WHERE namespace = ? AND id <= (
+                    SELECT id FROM {self.table} WHERE namespace = ?
+                    ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            """, (namespace, namespace, self.max_entries))
+            self.conn.commit()
+
+            if len(ids):
+                matrix = np.vstack([vector, matrix])[:self.max_entries]
+            else:
+                matrix = vector[np.newaxis, :]
+            ids = np.concatenate([[cursor.lastrowid], ids])[:self.max_entries]
+            created = np.concatenate([[now], created])[:self.max_entries]
+            self._entries[namespace] = (ids, created, matrix)
@@ -1,62 +1,90 @@
 import os
 from dotenv import load_dotenv
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class Config:
 
     # API Keys
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-    PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-    VOYAGEAI_API_KEY = os.getenv("VOYAGEAI_API_KEY")
+    ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
+    PINECONE_API_KEY: Optional[str] = os.getenv("PINECONE_API_KEY")
+    VOYAGEAI_API_KEY: Optional[str] = os.getenv("VOYAGEAI_API_KEY")
 
     # Pincone Settings
-    PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT", "us_west1-gcp")
-    PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "research-assistant")
+    PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "us_west1-gcp")
+    PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "research-assistant")
+
+    # Vector Store Settings ("pinecone", "faiss" or "sqlite-vec")
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "pinecone")
+    # Storage precision for the local backends ("float32" or "int8")
+    VECTOR_PRECISION: str = os.getenv("VECTOR_PRECISION", "float32")
 
     # Model Settings
-    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "voyage-4")
-    LLM_MODEL = os.getenv("LLM_MODEL", "claude-haiku-4-5-20251001-v1:0")
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "voyage-4")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "claude-haiku-4-5-20251001-v1:0")
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+    EMBED_MAX_BATCH_TOKENS: int = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "120000"))
+    EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", "8"))
+
+    # Ingestion Settings
+    INGEST_CONCURRENCY: int = int(os.getenv("INGEST_CONCURRENCY", "4"))
+    SUMMARY_CONCURRENCY: int = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+    # Articles shorter than this are summarized by their opening sentences
+    SUMMARY_LLM_MIN_WORDS: int = int(os.getenv("SUMMARY_LLM_MIN_WORDS", "400"))
 
     # Chunking Settings
-    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "600"))
-    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "600"))
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "100"))
 
     # Database SEttings
-    DATABASE_PATH = os.getenv("DATABASE_PATH", "data/research_assistant.db")
+    DATABASE_PATH: str = os.getenv("DATABASE_PATH", "data/research_assistant.db")
 
     #Retrieval Settings
-    TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "5"))
+    TOP_K_RESULTS: int = int(os.getenv("TOP_K_RESULTS", "5"))
+    # Fuse full-text keyword matches with the vector search results
+    HYBRID_SEARCH: bool = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+
+    # Cache Settings
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))
+    ANSWER_CACHE_TTL_DAYS: float = float(os.getenv("ANSWER_CACHE_TTL_DAYS", "7"))
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+    LLM_CACHE_TTL_DAYS: float = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
 
     #Paths
-    BASE_DIR = Path(__file__).parent.parent
-    DATA_DIR = BASE_DIR / "data"
-
-    @classmethod
-    def validate(cls):
-        """Validae that required environment variables are set."""
-        required_vars = [
-            "ANTHROPIC_API_KEY",
-            "PINECONE_API_KEY"
-        ]
-
-        missing = []
-        for var in required_vars:
-            if not getattr(cls, var):
-                missing.append(var)
-
-            if missing:
-                raise ValueError(
-                    f"Missing required environemtn variables: {', '.join(missing)}\n"
-                    f"Please et the min your .env file or environment"
-                )
+    BASE_DIR: Path = Path(__file__).parent.parent
+    DATA_DIR: Path = BASE_DIR / "data"
+
+    def validate(self):
+        """Validate that required environment variables are set."""
+        required_vars = ["ANTHROPIC_API_KEY"]
+        if self.VECTOR_BACKEND == "pinecone":
+            required_vars.append("PINECONE_API_KEY")
+
+        missing = [var for var in required_vars if not getattr(self, var)]
+        if missing:
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing)}\n"
+                f"Please set them in your .env file or environment"
+            )
         return True
     
-    @classmethod
-    def ensure_directories(cls):
-        """Ensure required directories exits."""
-        cls.DATA_DIR.mkdir(exist_ok=True)
+    def ensure_directories(self):
+        """Ensure required directories exist."""
+        self.DATA_DIR.mkdir(exist_ok=True)
         return True
     
-config = Config()
\ No newline at end of file
+config = Config()
+config.ensure_directories()
+
+# Validate configuration once, on first import
+try:
+    config.validate()
+    print("✓ Configuration validated")
+except ValueError as e:
+    print(f"✗ Configuration error: {e}")
+    print("Please check your .env file and ensure all required variables are set.")
@@ -0,0 +1,50 @@
+"""Persistent cache of LLM completions keyed by model and prompt."""
+import hashlib
+from utils.cache import KeyValueCache
+from utils.config import config
+
+llm_cache = KeyValueCache("llm_responses", ttl_seconds=config.LLM_CACHE_TTL_DAYS * 86400)
+
+
+def _cache_key(model: str, max_tokens: int, prompt: str) -> str:
+    return hashlib.blake2b(f"{model}|{max_tokens}|{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def cached_completion(client, model: str, prompt: str, max_tokens: int) -> str:
+    """
+    Text of a single-turn completion for `prompt`, reused for identical requests.
+
+    Prompts embed the retrieved context, so a changed library produces a
+    different key and never serves a stale response. Errors from the API
+    propagate to the caller and nothing is cached.
+    """
+    key = _cache_key(model, max_tokens, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    message = client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    text = message.content[0].text.strip()
+    llm_cache.set(key, text.encode("utf-8"))
+    return text
+
+
+async def acached_completion(client, model: str, prompt: str, max_tokens: int) -> str:
+    """cached_completion for an AsyncAnthropic client."""
+    key = _cache_key(model, max_tokens, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    message = await client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    text = message.content[0].text.strip()
+    llm_cache.set(key, text.encode("utf-8"))
+    return text
@@ -1,213 +1,367 @@
 """Text processing utilities for chunking and cleaning."""
+import bisect
+import hashlib
+import itertools
+import os
 import re
-from typing import List, Dict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import numpy as np
 import tiktoken
 
-def count_tokens(text: str, model: str = "cl100k_base") -> int:
-    """Count tokens in text using tiktoken."""
+try:
+    from numba import njit
+except ImportError:
+    # numba is pinned in requirements.txt; without it windows are laid out
+    # by a pure-Python loop over lists instead of the compiled kernel
+    njit = None
+
+_DISALLOWED_CHARS = re.compile(r'[^\w\s.,!?;:()\-\'\"]')
+# The same filter for ASCII text as a str.translate deletion table
+_ASCII_DISALLOWED = str.maketrans('', '', ''.join(
+    char for char in map(chr, range(128)) if _DISALLOWED_CHARS.match(char)
+))
+_DOT_RUNS = re.compile(r'\.{2,}')
+# Sentence-ending punctuation and the whitespace after it
+_SENTENCE_END = re.compile(r'[.!?]\s+')
+# A sentence break that is anything other than a single space
+_LOOSE_SENTENCE_BREAK = re.compile(r'[.!?](?:[^\S ]| \s)')
+_KEYWORD = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# Rough characters per cl100k token in English prose, and how far past
+# chunk_size a chunk built from that estimate may run before the text is
+# re-chunked with exact counts
+CHARS_PER_TOKEN = 4
+FAST_CHUNK_TOLERANCE = 0.05
+
+# Batches of texts at least this long in total are chunked across threads
+PARALLEL_CHUNK_MIN_CHARS = 1_000_000
+
+# Sentences tokenized per batch call while chunking by sentences
+SENTENCE_BATCH = 1024
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """
+    The tiktoken encoding for `model`, looked up once per process.
+    
+    None if it cannot be loaded (e.g. offline without a cached vocabulary);
+    the failure is cached too, so token counts fall back to an estimate
+    without retrying the load on every call.
+    """
     try:
-        encoding = tiktoken.get_encoding(model)
-        return len(encoding.encode(text))
+        return tiktoken.get_encoding(model)
     except Exception:
+        return None
+
+def count_tokens(text: str, model: str = "cl100k_base") -> int:
+    """Count tokens in text using tiktoken."""
+    encoding = _get_encoding(model)
+    if encoding is None:
         # Fallback to rough estimate
         return len(text) // 4
+    return len(encoding.encode_ordinary(text))
+
+def _token_counts(texts: List[str], model: str = "cl100k_base") -> np.ndarray:
+    """Token count of each text, encoded in a single batch call."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Fallback to rough estimate
+        counts = (len(text) // 4 for text in texts)
+    else:
+        counts = map(len, encoding.encode_ordinary_batch(texts))
+    return np.fromiter(counts, dtype=np.int32, count=len(texts))
+
+def _estimated_token_counts(texts: List[str]) -> np.ndarray:
+    """Token counts estimated at CHARS_PER_TOKEN, rounded up so every non-empty text counts."""
+    lengths = np.fromiter(map(len, texts), dtype=np.int32, count=len(texts))
+    return (lengths + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
 
 def clean_text(text: str) -> str:
     """Clean and normalize text."""
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    # Remove excessive whitespace; str.split matches the same characters as \s
+    # without a regex pass
+    text = ' '.join(text.split())
     
     # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s.,!?;:()\-\'\"]', '', text)
+    if text.isascii():
+        text = text.translate(_ASCII_DISALLOWED)
+    else:
+        text = _DISALLOWED_CHARS.sub('', text)
     
-    # Remove multiple periods
-    text = re.sub(r'\.{2,}', '.', text)
+    # Remove multiple periods, skipping the pass when there are none
+    if '..' in text:
+        text = _DOT_RUNS.sub('.', text)
     
     return text.strip()
 
-def chunk_text(
+def iter_chunks(
     text: str, 
     chunk_size: int = 600, 
     chunk_overlap: int = 100,
-    preserve_sentences: bool = True
-) -> List[Dict[str, any]]:
+    preserve_sentences: bool = True,
+    fast: bool = True
+) -> Iterator[Dict[str, any]]:
     """
-    Split text into overlapping chunks.
+    Split text into overlapping chunks, yielded one at a time.
     
     Args:
         text: Text to chunk
         chunk_size: Target size in tokens
         chunk_overlap: Overlap between chunks in tokens
         preserve_sentences: Try to split on sentence boundaries
+        fast: Without sentence boundaries, size words by character length
+            and tokenize only the finished chunks
     
-    Returns:
-        List of dicts with 'text' and 'metadata' keys
+    Yields:
+        Dicts with 'text' and 'metadata' keys
     """
     if preserve_sentences:
-        return _chunk_by_sentences(text, chunk_size, chunk_overlap)
+        return _iter_chunks_by_sentences(text, chunk_size, chunk_overlap)
     else:
-        return _chunk_by_tokens(text, chunk_size, chunk_overlap)
+        return _iter_chunks_by_tokens(text, chunk_size, chunk_overlap, fast)
+
+def chunk_text(
+    text: str, 
+    chunk_size: int = 600, 
+    chunk_overlap: int = 100,
+    preserve_sentences: bool = True,
+    fast: bool = True
+) -> List[Dict[str, any]]:
+    """Split text into overlapping chunks; the list form of iter_chunks."""
+    return list(iter_chunks(text, chunk_size, chunk_overlap, preserve_sentences, fast))
+
+def chunk_texts(texts: List[str], **kwargs) -> List[List[Dict[str, any]]]:
+    """
+    chunk_text for each of several texts, in input order.
+    
+    Large batches are split across one thread per CPU. tiktoken releases
+    the GIL while encoding, which is where most of the chunking time goes;
+    threads rather than processes keep this safe to call from the
+    multithreaded app, where forking could deadlock on locks held by
+    other threads.
+    """
+    cpus = os.cpu_count() or 1
+    if len(texts) < 2 or cpus < 2 or sum(map(len, texts)) < PARALLEL_CHUNK_MIN_CHARS:
+        return [chunk_text(text, **kwargs) for text in texts]
+    
+    with ThreadPoolExecutor(max_workers=min(cpus, len(texts))) as executor:
+        return list(executor.map(partial(chunk_text, **kwargs), texts))
+
+def _sentence_bounds(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Start and end offsets of each sentence, split after each run of
+    whitespace that follows '.', '!' or '?'.
+    
+    The spans of re.split(r'(?<=[.!?])\s+', text), found by a forward scan
+    without the lookbehind and without materializing the sentences.
+    """
+    breaks = np.fromiter(
+        itertools.chain.from_iterable(match.span() for match in _SENTENCE_END.finditer(text)),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    starts = np.concatenate(([0], breaks[:, 1]))
+    ends = np.concatenate((breaks[:, 0] + 1, [len(text)]))
+    return starts, ends
+
+def _split_sentences(text: str) -> List[str]:
+    """Sentences of text, as split by _sentence_bounds."""
+    starts, ends = _sentence_bounds(text)
+    return [text[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
 
-def _chunk_by_sentences(text: str, chunk_size: int, chunk_overlap: int) -> List[Dict]:
-    """Chunk text by sentences to preserve semantic boundaries."""
+def _joined_offsets(pieces: List[str]) -> List[int]:
+    """
+    Where each piece starts in ' '.join(pieces).
+    
+    A window [start, end) of the pieces is joined[offsets[start]:offsets[end] - 1].
+    """
+    offsets = np.zeros(len(pieces) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.fromiter(map(len, pieces), dtype=np.int64, count=len(pieces)) + 1)
+    return offsets.tolist()
+
+def _iter_chunks_by_sentences(text: str, chunk_size: int, chunk_overlap: int) -> Iterator[Dict]:
+    """
+    Chunk text by sentences to preserve semantic boundaries.
+    
+    Each run of sentences that fit in chunk_size is packed into overlapping
+    windows; a sentence that does not fit on its own is split into windows
+    of its words. Both are laid out by _window_bounds.
+    
+    Sentences are tokenized SENTENCE_BATCH at a time and only their offsets
+    are kept, so a long text is never held as a list of sentences. When
+    the sentences are separated by single spaces (as in cleaned text) each
+    chunk is a direct slice of text.
+    """
     # Split into sentences (simple approach)
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    starts, ends = _sentence_bounds(text)
+    num_sentences = len(starts)
+    if len(text) <= chunk_size and len(text.encode('utf-8')) <= chunk_size:
+        # Every token covers at least one byte, so the whole text fits in one
+        # chunk and the sentences need not be tokenized
+        sentence_token_counts = np.zeros(num_sentences, dtype=np.int32)
+    else:
+        sentence_token_counts = np.concatenate([
+            _token_counts([
+                text[start:end] for start, end in
+                zip(starts[batch:batch + SENTENCE_BATCH].tolist(), ends[batch:batch + SENTENCE_BATCH].tolist())
+            ])
+            for batch in range(0, num_sentences, SENTENCE_BATCH)
+        ])
     
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
+    single_spaced = _LOOSE_SENTENCE_BREAK.search(text) is None
+    chunk_indexes = itertools.count()
     
-    for i, sentence in enumerate(sentences):
-        sentence_tokens = count_tokens(sentence)
+    run_start = 0
+    long_sentences = np.flatnonzero(sentence_token_counts > chunk_size).tolist()
+    for i in long_sentences + [num_sentences]:
+        for start, end in _window_bounds(sentence_token_counts[run_start:i], chunk_size, chunk_overlap):
+            start += run_start
+            end += run_start
+            if single_spaced:
+                chunk = text[starts[start]:ends[end - 1]]
+            else:
+                chunk = ' '.join(text[starts[k]:ends[k]] for k in range(start, end))
+            yield {
+                'text': chunk,
+                'chunk_index': next(chunk_indexes),
+                'start_sentence': start,
+                'end_sentence': end - 1
+            }
+        if i == num_sentences:
+            break
         
-        # If single sentence exceeds chunk size, split it
-        if sentence_tokens > chunk_size:
-            if current_chunk:
-                chunks.append({
-                    'text': ' '.join(current_chunk),
-                    'chunk_index': len(chunks),
-                    'start_sentence': i - len(current_chunk),
-                    'end_sentence': i - 1
-                })
-                current_chunk = []
-                current_tokens = 0
-            
-            # Split long sentence by words
-            words = sentence.split()
-            temp_chunk = []
-            temp_tokens = 0
-            
-            for word in words:
-                word_tokens = count_tokens(word)
-                if temp_tokens + word_tokens > chunk_size and temp_chunk:
-                    chunks.append({
-                        'text': ' '.join(temp_chunk),
-                        'chunk_index': len(chunks),
-                        'start_sentence': i,
-                        'end_sentence': i
-                    })
-                    # Keep overlap
-                    overlap_words = []
-                    overlap_tokens = 0
-                    for w in reversed(temp_chunk):
-                        w_tokens = count_tokens(w)
-                        if overlap_tokens + w_tokens <= chunk_overlap:
-                            overlap_words.insert(0, w)
-                            overlap_tokens += w_tokens
-                        else:
-                            break
-                    temp_chunk = overlap_words
-                    temp_tokens = overlap_tokens
-                
-                temp_chunk.append(word)
-                temp_tokens += word_tokens
-            
-            if temp_chunk:
-                chunks.append({
-                    'text': ' '.join(temp_chunk),
-                    'chunk_index': len(chunks),
-                    'start_sentence': i,
-                    'end_sentence': i
-                })
-            continue
-        
-        # Check if adding this sentence exceeds chunk size
-        if current_tokens + sentence_tokens > chunk_size and current_chunk:
-            # Save current chunk
-            chunks.append({
-                'text': ' '.join(current_chunk),
-                'chunk_index': len(chunks),
-                'start_sentence': i - len(current_chunk),
-                'end_sentence': i - 1
-            })
-            
-            # Keep overlap sentences
-            overlap_chunk = []
-            overlap_tokens = 0
-            for sent in reversed(current_chunk):
-                sent_tokens = count_tokens(sent)
-                if overlap_tokens + sent_tokens <= chunk_overlap:
-                    overlap_chunk.insert(0, sent)
-                    overlap_tokens += sent_tokens
-                else:
-                    break
-            
-            current_chunk = overlap_chunk
-            current_tokens = overlap_tokens
-        
-        current_chunk.append(sentence)
-        current_tokens += sentence_tokens
-    
-    # Add remaining chunk
-    if current_chunk:
-        chunks.append({
-            'text': ' '.join(current_chunk),
-            'chunk_index': len(chunks),
-            'start_sentence': len(sentences) - len(current_chunk),
-            'end_sentence': len(sentences) - 1
-        })
-    
-    return chunks
-
-def _chunk_by_tokens(text: str, chunk_size: int, chunk_overlap: int) -> List[Dict]:
-    """Simple chunking by token count."""
+        # Split long sentence by words
+        words = text[starts[i]:ends[i]].split()
+        joined_words = ' '.join(words)
+        word_offsets = _joined_offsets(words)
+        for start, end in _window_bounds(_token_counts(words), chunk_size, chunk_overlap):
+            yield {
+                'text': joined_words[word_offsets[start]:word_offsets[end] - 1],
+                'chunk_index': next(chunk_indexes),
+                'start_sentence': i,
+                'end_sentence': i
+            }
+        run_start = i + 1
+
+def _window_bounds(token_counts: np.ndarray, chunk_size: int, chunk_overlap: int) -> List[List[int]]:
+    """
+    Greedy overlapping windows over a sequence of token counts.
+
+    Returns [start, end) item indices per window. A window closes before
+    the item that would push it past chunk_size, and the next one starts
+    with as many trailing items as fit in chunk_overlap.
+    """
+    if _compiled_window_bounds is None:
+        return _window_bounds_py(token_counts.tolist(), chunk_size, chunk_overlap)
+    return _compiled_window_bounds(token_counts, chunk_size, chunk_overlap).tolist()
+
+def _window_bounds_py(token_counts: List[int], chunk_size: int, chunk_overlap: int) -> List[List[int]]:
+    """_window_bounds on plain lists, for installs without numba."""
+    n = len(token_counts)
+    cumulative = [0, *itertools.accumulate(token_counts)]
+    bounds = []
+    start = 0
+
+    for i in range(n):
+        if cumulative[i + 1] - cumulative[start] > chunk_size and i > start:
+            bounds.append([start, i])
+            start = max(start, bisect.bisect_left(cumulative, cumulative[i] - chunk_overlap))
+
+    if n > start:
+        bounds.append([start, n])
+    return bounds
+
+def _window_bounds_kernel(token_counts: np.ndarray, chunk_size: int, chunk_overlap: int) -> np.ndarray:
+    """_window_bounds as an (n, 2) array, compiled by numba."""
+    n = len(token_counts)
+    bounds = np.empty((max(n, 1), 2), dtype=np.int64)
+    # cumulative[k] is the token count of items [0, k)
+    cumulative = np.zeros(n + 1, dtype=np.int64)
+    cumulative[1:] = np.cumsum(token_counts)
+    count = 0
+    start = 0
+
+    for i in range(n):
+        if cumulative[i + 1] - cumulative[start] > chunk_size and i > start:
+            bounds[count, 0] = start
+            bounds[count, 1] = i
+            count += 1
+
+            # Keep overlap: the first item from which the rest of the window
+            # fits in chunk_overlap, found by binary search
+            start = max(start, np.searchsorted(cumulative, cumulative[i] - chunk_overlap))
+
+    if n > start:
+        bounds[count, 0] = start
+        bounds[count, 1] = n
+        count += 1
+
+    return bounds[:count]
+
+_compiled_window_bounds = njit(cache=True)(_window_bounds_kernel) if njit else None
+
+def _iter_chunks_by_tokens(text: str, chunk_size: int, chunk_overlap: int, fast: bool = False) -> Iterator[Dict]:
+    """
+    Simple chunking by token count.
+    
+    With fast=True the windows are laid out from estimated word counts and
+    the chunks are tokenized in one batch to check them. If any runs more
+    than FAST_CHUNK_TOLERANCE past chunk_size, the text is chunked again
+    from exact per-word counts.
+    """
     words = text.split()
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
     
-    for word in words:
-        word_tokens = count_tokens(word)
-        
-        if current_tokens + word_tokens > chunk_size and current_chunk:
-            chunks.append({
-                'text': ' '.join(current_chunk),
-                'chunk_index': len(chunks)
-            })
-            
-            # Keep overlap
-            overlap_chunk = []
-            overlap_tokens = 0
-            for w in reversed(current_chunk):
-                w_tokens = count_tokens(w)
-                if overlap_tokens + w_tokens <= chunk_overlap:
-                    overlap_chunk.insert(0, w)
-                    overlap_tokens += w_tokens
-                else:
-                    break
-            
-            current_chunk = overlap_chunk
-            current_tokens = overlap_tokens
-        
-        current_chunk.append(word)
-        current_tokens += word_tokens
+    if fast:
+        bounds = _window_bounds(_estimated_token_counts(words), chunk_size, chunk_overlap)
+        windows = [' '.join(words[start:end]) for start, end in bounds]
+        if not windows or _token_counts(windows).max() <= chunk_size * (1 + FAST_CHUNK_TOLERANCE):
+            for i, chunk in enumerate(windows):
+                yield {'text': chunk, 'chunk_index': i}
+            return
     
-    if current_chunk:
-        chunks.append({
-            'text': ' '.join(current_chunk),
-            'chunk_index': len(chunks)
-        })
+    token_counts = _token_counts(words)
     
-    return chunks
+    for i, (start, end) in enumerate(_window_bounds(token_counts, chunk_size, chunk_overlap)):
+        yield {'text': ' '.join(words[start:end]), 'chunk_index': i}
+
+# Common words never reported as keywords
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'should', 'could', 'may', 'might', 'must', 'can', 'this',
+    'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
+})
 
 def extract_keywords(text: str, top_n: int = 5) -> List[str]:
     """Extract simple keywords from text (basic implementation)."""
-    # Remove common stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-                  'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
-                  'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-                  'would', 'should', 'could', 'may', 'might', 'must', 'can', 'this',
-                  'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'}
-    
-    # Get words, lowercase, filter
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    words = [w for w in words if w not in stop_words]
-    
-    # Count frequency
-    word_freq = {}
-    for word in words:
-        word_freq[word] = word_freq.get(word, 0) + 1
-    
-    # Get top N
-    sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-    return [word for word, _ in sorted_words[:top_n]]
\ No newline at end of file
+    # Get words, lowercase, and remove common stop words
+    words = (w for w in _KEYWORD.findall(text.lower()) if w not in STOP_WORDS)
+    
+    # Count frequency and get top N; ties keep first-occurrence order
+    return [word for word, _ in Counter(words).most_common(top_n)]
+
+# Query parameters that only track where a link was shared
+TRACKING_PARAMS = {'fbclid', 'gclid'}
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL, so links to the same article compare equal."""
+    parts = urlsplit(url.strip())
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip('/'),
+        urlencode(query),
+        ''
+    ))
+
+def url_hash(url: str) -> str:
+    """Short stable key of a URL's normalized form."""
+    return hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=8).hexdigest()